@@ -1,38 +1,104 @@
+from collections import deque
 from collections.abc import Callable
 
+from utils import map_reduce_lines
+
 def calibration_value_part1(line: str) -> int:
-    first, second = "", ""
-    for i in range(len(line)):
-        if line[i].isdigit():
-            first = line[i]
-            break
-    for i in range(-1, -1*len(line)-1, -1):
-        # i is -1,-2,...-n
-        if line[i].isdigit():
-            second = line[i]
-            break
-    return int(f"{first}{second}")
+    return calibration_values(line.encode())[0]
 
 def process_lines(file_name, calibration_func: Callable[[str], int]) -> int:
     with open(file_name, 'r') as file:
         return sum(calibration_func(line) for line in file)
 
-import re
-
 digits = [str(i) for i in range(10)] # ["0", "1", ... "9"]
 digits_in_letters = ["zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine"]
-forward_search_pattern = "|".join(digits + digits_in_letters)
-digits_in_reversed_letters = [digit_in_letters[::-1] for digit_in_letters in digits_in_letters]
-backward_search_pattern = "|".join(digits + digits_in_reversed_letters)
-to_digits = dict(zip(digits, digits)) | dict(zip(digits_in_letters, digits)) | dict(zip(digits_in_reversed_letters, digits))
+
+def build_automaton(patterns: dict[bytes, int]) -> tuple[list[int], list[int], list[int]]:
+    """
+    Build an Aho-Corasick automaton over bytes for the given pattern -> value dict.
+
+    Failure links are folded into a dense transition table, so scanning is a single
+    table lookup per byte.  Returns (transitions, values, lengths) where
+    transitions[state * 256 + byte] is the next state, and values[state] / lengths[state]
+    describe the longest pattern ending at state (value -1 if none).
+    """
+    # build the trie
+    trie: list[dict[int, int]] = [{}]
+    values, lengths = [-1], [0]
+    for pattern, value in patterns.items():
+        state = 0
+        for byte in pattern:
+            if byte not in trie[state]:
+                trie.append({})
+                values.append(-1)
+                lengths.append(0)
+                trie[state][byte] = len(trie) - 1
+            state = trie[state][byte]
+        values[state], lengths[state] = value, len(pattern)
+
+    # breadth first over the trie to resolve failure links into full transitions
+    transitions = [0] * (len(trie) * 256)
+    for byte, child in trie[0].items():
+        transitions[byte] = child
+    queue = deque(trie[0].values())
+    failures = [0] * len(trie)
+    while queue:
+        state = queue.popleft()
+        fallback = failures[state]
+        if values[state] == -1 and values[fallback] != -1:
+            # inherit the pattern ending at the longest proper suffix, e.g. "twone" -> "one"
+            values[state], lengths[state] = values[fallback], lengths[fallback]
+        for byte in range(256):
+            child = trie[state].get(byte)
+            if child is None:
+                transitions[state * 256 + byte] = transitions[fallback * 256 + byte]
+            else:
+                transitions[state * 256 + byte] = child
+                failures[child] = transitions[fallback * 256 + byte]
+                queue.append(child)
+    return transitions, values, lengths
+
+transitions, values, lengths = build_automaton(
+    {digit.encode(): int(digit) for digit in digits}
+    | {digit_in_letters.encode(): i for i, digit_in_letters in enumerate(digits_in_letters)}
+)
+numeric = frozenset(digit.encode()[0] for digit in digits)
+
+def calibration_values(line: bytes) -> tuple[int, int]:
+    """Returns (part 1, part 2) calibration values of a line using a single forward scan."""
+    state = 0
+    first_digit, last_digit = -1, -1
+    first, first_start, last = -1, 0, -1
+    for i, byte in enumerate(line):
+        state = transitions[state * 256 + byte]
+        value = values[state]
+        if value == -1:
+            continue
+        if byte in numeric:
+            if first_digit == -1:
+                first_digit = value
+            last_digit = value
+        # a match is first if it starts before every match seen so far, overlaps such as
+        # "twone" match both "two" and "one" since the scan never consumes characters
+        start = i - lengths[state]
+        if first == -1 or start < first_start:
+            first, first_start = value, start
+        last = value
+    part1 = first_digit * 10 + last_digit if first_digit != -1 else 0
+    part2 = first * 10 + last if first != -1 else 0
+    return part1, part2
 
 def calibration_value_part2(line: str) -> int:
-    first_match = re.search(forward_search_pattern, line).group(0)
-    last_match = re.search(backward_search_pattern, line[::-1]).group(0)
-    first = to_digits[first_match]
-    last = to_digits[last_match]
-    return int(f"{first}{last}")
+    return calibration_values(line.encode())[1]
+
+def add_pairs(a: tuple[int, int], b: tuple[int, int]) -> tuple[int, int]:
+    return a[0] + b[0], a[1] + b[1]
+
+def process_file(file_name, workers: int = None) -> tuple[int, int]:
+    """Returns the sum of (part 1, part 2) calibration values, both parts computed in the same scan."""
+    return map_reduce_lines(file_name, calibration_values, add_pairs, (0, 0), workers=workers, binary=True)
 
 if __name__=="__main__":
-    print(process_lines("tests/day01.input", calibration_value_part1))
-    print(process_lines("tests/day01.input", calibration_value_part2))
\ No newline at end of file
+    part1, part2 = process_file("tests/day01.input")
+    print(part1)
+    print(part2)
\ No newline at end of file
@@ -1,6 +1,10 @@
-from day01 import process_lines
+from array import array
+from collections.abc import Iterable
+from dataclasses import dataclass, field
 from math import prod
 
+from utils import map_line_chunks
+
 # part 1
 THRESHOLD = {"red": 12, "green": 13, "blue": 14}
 
@@ -28,6 +32,87 @@ def power_of_min_set(line: str) -> int:
     return prod(max_cubes.values())
 
 
+# columnar records, parsed once and queried for both parts
+COLORS = ("red", "green", "blue")
+COLOR_CODES = {color: code for code, color in enumerate(COLORS)}
+
+
+@dataclass
+class GameRecords:
+    """One entry per revealed cube count, stored as parallel arrays."""
+
+    game_ids: array = field(default_factory=lambda: array("I"))
+    round_indices: array = field(default_factory=lambda: array("I"))
+    color_codes: array = field(default_factory=lambda: array("B"))
+    counts: array = field(default_factory=lambda: array("I"))
+
+    def extend(self, other: "GameRecords") -> None:
+        self.game_ids.extend(other.game_ids)
+        self.round_indices.extend(other.round_indices)
+        self.color_codes.extend(other.color_codes)
+        self.counts.extend(other.counts)
+
+
+def parse_games(lines: Iterable[str]) -> GameRecords:
+    records = GameRecords()
+    for line in lines:
+        game_header, game_content = line.split(":")
+        game_number = int(game_header.split()[1])
+        for round_index, round in enumerate(game_content.split(';')):
+            for color_count in round.split(','):
+                count, color = color_count.split()
+                records.game_ids.append(game_number)
+                records.round_indices.append(round_index)
+                records.color_codes.append(COLOR_CODES[color])
+                records.counts.append(int(count))
+    return records
+
+
+def read_games(file_name: str, workers: int = None) -> GameRecords:
+    """Parse the chunks of file_name in parallel with map_line_chunks, then concatenate their columns in order."""
+    records = GameRecords()
+    for chunk_records in map_line_chunks(file_name, parse_games, workers=workers):
+        records.extend(chunk_records)
+    return records
+
+
+def max_cubes_per_game(records: GameRecords) -> tuple[list[int], list[list[int]]]:
+    """
+    Group records by game (records of a game are contiguous) and reduce counts with max.
+
+    Returns the game ids, and for each color code a list of max counts aligned with the game ids.
+    """
+    game_ids: list[int] = []
+    max_cubes: list[list[int]] = [[] for _ in COLORS]
+    for game_id, color_code, count in zip(records.game_ids, records.color_codes, records.counts):
+        if not game_ids or game_ids[-1] != game_id:
+            game_ids.append(game_id)
+            for color_max in max_cubes:
+                color_max.append(0)
+        if max_cubes[color_code][-1] < count:
+            max_cubes[color_code][-1] = count
+    return game_ids, max_cubes
+
+
+def sum_possible_games(records: GameRecords, thresholds: list[dict[str, int]]) -> list[int]:
+    """Evaluate part 1 for every threshold, reusing the per game maxima computed once."""
+    game_ids, max_cubes = max_cubes_per_game(records)
+    results = []
+    for threshold in thresholds:
+        limits = [threshold[color] for color in COLORS]
+        possible = [True] * len(game_ids)
+        for color_max, limit in zip(max_cubes, limits):
+            possible = [ok and count <= limit for ok, count in zip(possible, color_max)]
+        results.append(sum(game_id for game_id, ok in zip(game_ids, possible) if ok))
+    return results
+
+
+def sum_power_of_min_sets(records: GameRecords) -> int:
+    _, max_cubes = max_cubes_per_game(records)
+    return sum(prod(color_maxes) for color_maxes in zip(*max_cubes))
+
+
 if __name__ == "__main__":
-    print(process_lines("tests/day02.input", possible_game))
-    print(process_lines("tests/day02.input", power_of_min_set))
\ No newline at end of file
+    records = read_games("tests/day02.input")
+    print(sum_possible_games(records, [THRESHOLD])[0])
+    print(sum_power_of_min_sets(records))
\ No newline at end of file
@@ -1,56 +1,177 @@
-from collections import defaultdict
-
-
-def coordinates_adj_to_symbol(row: int, col: int, schematic: list[str]) -> frozenset:
-    min_row, max_row = 0, len(schematic) - 1
-    min_col, max_col = 0, len(schematic[0]) - 1
-    return {
-        (max(min_row, row - 1), max(min_col, col - 1)),
-        (max(min_row, row - 1), col),
-        (max(min_row, row - 1), min(max_col, col + 1)),
-        (row, max(min_col, col - 1)),
-        (row, min(max_col, col + 1)),
-        (min(max_row, row + 1), max(min_col, col - 1)),
-        (min(max_row, row + 1), col),
-        (min(max_row, row + 1), min(max_col, col + 1)),
-    } - {(row, col)}
+import re
+from array import array
+from itertools import count
+
+NUMBER = re.compile(r"\d+")
+SYMBOL = re.compile(r"[^\d.]")
+
+
+def label_numbers(schematic: list[str]) -> tuple[array, list[int]]:
+    """
+    Label each run of digits once.
+
+    Returns (labels, numbers) where labels[row * width + col] is the index into numbers of
+    the number covering that cell, or -1 if the cell is not a digit.
+    """
+    width = len(schematic[0])
+    labels = array("i", [-1]) * (len(schematic) * width)
+    numbers: list[int] = []
+    for row, line in enumerate(schematic):
+        for match in NUMBER.finditer(line):
+            start, end = row * width + match.start(), row * width + match.end()
+            labels[start:end] = array("i", [len(numbers)]) * (end - start)
+            numbers.append(int(match.group()))
+    return labels, numbers
+
+
+def adjacent_labels(labels: array, row: int, col: int, height: int, width: int) -> set[int]:
+    """Returns the distinct number labels within the 3x3 block around (row, col)."""
+    cols = range(max(col - 1, 0), min(col + 2, width))
+    return {labels[r * width + c] for r in range(max(row - 1, 0), min(row + 2, height)) for c in cols} - {-1}
+
+
+def part_numbers_and_gear_ratio(schematic: list[str]) -> tuple[list[int], int]:
+    """Returns part numbers (part 1) and the sum of gear ratios (part 2) from a single pass over the symbols."""
+    height, width = len(schematic), len(schematic[0])
+    labels, numbers = label_numbers(schematic)
+    is_part = bytearray(len(numbers))
+    gear_ratio = 0
+    for row, line in enumerate(schematic):
+        for match in SYMBOL.finditer(line):
+            adjacent = adjacent_labels(labels, row, match.start(), height, width)
+            for label in adjacent:
+                is_part[label] = 1
+            if match.group() == "*" and len(adjacent) == 2:
+                first, second = adjacent
+                gear_ratio += numbers[first] * numbers[second]
+    return [number for number, part in zip(numbers, is_part) if part], gear_ratio
 
 
 def get_part_numbers(schematic: list[str]) -> list[int]:
-    # build adjacent coordinates
-    adjacent_coordinates = set()
-    for row in range(len(schematic)):
-        for col in range(len(schematic[0])):
-            if schematic[row][col] not in "0123456789.":
-                # found a symbol
-                adjacent_coordinates |= coordinates_adj_to_symbol(row, col, schematic)
-
-    part_numbers = []
-    for row in range(len(schematic)):
-        tracking_digits = []
-        tracking_coordinates = set()
-        col = 0
-        while col < len(schematic[0]):
-            if schematic[row][col] in "0123456789":
-                tracking_digits.append(schematic[row][col])
-                tracking_coordinates.add((row, col))
-            elif not tracking_digits:
-                # tracking_digits empty, this [row][col] is not a digit either, move on
-                pass
-            else:
-                # tracking_digits not-empty, but [row][col] is no longer a digit
-                # check if tracking_digits is a part_number, then reset tracking
-                if not tracking_coordinates.isdisjoint(adjacent_coordinates):
-                    # a part_number found
-                    part_numbers.append(int("".join(tracking_digits)))
-                tracking_digits = []
-                tracking_coordinates = set()
-            col += 1
-        # reached the end of the row, do part_number check in case tracking_digits extends all the way to the end of the row.
-        if not tracking_coordinates.isdisjoint(adjacent_coordinates):
-            # a part_number found, reset
-            part_numbers.append(int("".join(tracking_digits)))
-    return part_numbers
+    return part_numbers_and_gear_ratio(schematic)[0]
+
+
+class Schematic:
+    """
+    Mutable schematic that keeps the part number sum and gear ratio up to date.
+
+    Each number run has a label, the number of symbols adjacent to it is tracked per label, and
+    every asterisk keeps the set of labels adjacent to it, so set_cell only revisits the cells
+    around the edited one.
+    """
+
+    def __init__(self, schematic: list[str]):
+        self.height, self.width = len(schematic), len(schematic[0])
+        self.grid = [list(line) for line in schematic]
+        self.labels = array("i", [-1]) * (self.height * self.width)
+        self.runs: dict[int, tuple[int, int, int, int]] = {}  # label -> (row, start col, end col, number)
+        self.symbol_counts: dict[int, int] = {}  # label -> number of adjacent symbols
+        self.asterisks: dict[int, set[int]] = {}  # flat index of "*" -> adjacent labels
+        self.new_labels = count()
+        self.part_number_sum = 0
+        self.gear_ratio = 0
+        for row, line in enumerate(schematic):
+            for match in NUMBER.finditer(line):
+                self._add_run(row, match.start(), match.end())
+        for row, line in enumerate(schematic):
+            for match in SYMBOL.finditer(line):
+                if match.group() == "*":
+                    self._update_asterisk(row * self.width + match.start(), self._adjacent_labels(row, match.start()))
+
+    def _adjacent_labels(self, row: int, col: int) -> set[int]:
+        return adjacent_labels(self.labels, row, col, self.height, self.width)
+
+    def _block(self, row: int, start: int, end: int) -> list[tuple[int, int]]:
+        """Cells surrounding row[start:end], including the run itself."""
+        return [
+            (r, c)
+            for r in range(max(row - 1, 0), min(row + 2, self.height))
+            for c in range(max(start - 1, 0), min(end + 1, self.width))
+        ]
+
+    def _gear(self, adjacent: set[int]) -> int:
+        if len(adjacent) != 2:
+            return 0
+        first, second = adjacent
+        return self.runs[first][3] * self.runs[second][3]
+
+    def _update_asterisk(self, index: int, adjacent: set[int]) -> None:
+        self.gear_ratio -= self._gear(self.asterisks.get(index, set()))
+        self.gear_ratio += self._gear(adjacent)
+        self.asterisks[index] = adjacent
+
+    def _add_run(self, row: int, start: int, end: int) -> None:
+        label = next(self.new_labels)
+        number = int("".join(self.grid[row][start:end]))
+        self.runs[label] = (row, start, end, number)
+        offset = row * self.width
+        self.labels[offset + start : offset + end] = array("i", [label]) * (end - start)
+        symbols = 0
+        for r, c in self._block(row, start, end):
+            char = self.grid[r][c]
+            if char in "0123456789.":
+                continue
+            symbols += 1
+            if char == "*":
+                index = r * self.width + c
+                self._update_asterisk(index, self.asterisks.get(index, set()) | {label})
+        self.symbol_counts[label] = symbols
+        if symbols:
+            self.part_number_sum += number
+
+    def _remove_run(self, label: int) -> None:
+        row, start, end, number = self.runs[label]
+        for r, c in self._block(row, start, end):
+            if self.grid[r][c] == "*":
+                index = r * self.width + c
+                self._update_asterisk(index, self.asterisks[index] - {label})
+        if self.symbol_counts.pop(label):
+            self.part_number_sum -= number
+        offset = row * self.width
+        self.labels[offset + start : offset + end] = array("i", [-1]) * (end - start)
+        del self.runs[label]
+
+    def _add_symbol(self, row: int, col: int, symbol: str) -> None:
+        adjacent = self._adjacent_labels(row, col)
+        for label in adjacent:
+            if self.symbol_counts[label] == 0:
+                self.part_number_sum += self.runs[label][3]
+            self.symbol_counts[label] += 1
+        if symbol == "*":
+            self._update_asterisk(row * self.width + col, adjacent)
+
+    def _remove_symbol(self, row: int, col: int, symbol: str) -> None:
+        adjacent = self._adjacent_labels(row, col)
+        for label in adjacent:
+            self.symbol_counts[label] -= 1
+            if self.symbol_counts[label] == 0:
+                self.part_number_sum -= self.runs[label][3]
+        if symbol == "*":
+            self._update_asterisk(row * self.width + col, set())
+            del self.asterisks[row * self.width + col]
+
+    def set_cell(self, row: int, col: int, char: str) -> None:
+        """Set schematic[row][col] to char, updating part_number_sum and gear_ratio."""
+        old_char = self.grid[row][col]
+        if old_char == char:
+            return
+        if old_char not in "0123456789.":
+            self._remove_symbol(row, col, old_char)
+            self.grid[row][col] = "."
+        # runs touching col may be split, extended or merged, rebuild them
+        offset = row * self.width
+        span_start, span_end = col, col + 1
+        for label in {self.labels[offset + c] for c in range(max(col - 1, 0), min(col + 2, self.width))} - {-1}:
+            _, start, end, _ = self.runs[label]
+            span_start, span_end = min(span_start, start), max(span_end, end)
+            self._remove_run(label)
+        # symbols are added after the runs, so a new symbol is not counted twice
+        self.grid[row][col] = char if char.isdigit() else "."
+        for match in NUMBER.finditer("".join(self.grid[row][span_start:span_end])):
+            self._add_run(row, span_start + match.start(), span_start + match.end())
+        self.grid[row][col] = char
+        if char not in "0123456789.":
+            self._add_symbol(row, col, char)
 
 
 def make_schematic(file_name: str) -> list[str]:
@@ -59,79 +180,13 @@ def make_schematic(file_name: str) -> list[str]:
 
 
 # part 2
-def adj_coordinates_to_asterisks(schematic: list[str]) -> list[tuple[int, int]]:
-    adj_to_asterisks = {}
-    adjs = set()
-    for row in range(len(schematic)):
-        for col in range(len(schematic[0])):
-            if schematic[row][col] == "*":
-                for adj in coordinates_adj_to_symbol(row, col, schematic):
-                    adj_to_asterisks[adj] = (row, col)
-                    adjs.add(adj)
-    return adj_to_asterisks, adjs
-
-
 def get_gear_ratio(schematic: list[str]) -> int:
-    # build adjacent coordinates
-    adjs_to_asterisks, adjs = adj_coordinates_to_asterisks(schematic)
-    asterisks_to_part_numbers = defaultdict(list)
-
-    for row in range(len(schematic)):
-        tracking_digits = []
-        tracking_coordinates = set()
-        col = 0
-        while col < len(schematic[0]):
-            if schematic[row][col] in "0123456789":
-                tracking_digits.append(schematic[row][col])
-                tracking_coordinates.add((row, col))
-            elif not tracking_digits:
-                # tracking_digits empty, this [row][col] is not a digit either, move on
-                pass
-            else:
-                # tracking_digits not-empty, but [row][col] is no longer a digit
-                # check if tracking_digits is a part_number, then reset tracking
-                if digits_adj_to_asterisk := tracking_coordinates & adjs:
-                    # a part_number that is adjacent to an asterisk is found
-                    record_asterisk_to_part_number(
-                        digits_adj_to_asterisk,
-                        adjs_to_asterisks,
-                        asterisks_to_part_numbers,
-                        part_number=int("".join(tracking_digits)),
-                    )
-                tracking_digits = []
-                tracking_coordinates = set()
-            col += 1
-        # reached the end of the row, do part_number check in case tracking_digits extends all the way to the end of the row.
-        if digits_adj_to_asterisk := tracking_coordinates & adjs:
-            # a part_number that is adjacent to an asterisk is found
-            record_asterisk_to_part_number(
-                digits_adj_to_asterisk,
-                adjs_to_asterisks,
-                asterisks_to_part_numbers,
-                part_number=int("".join(tracking_digits)),
-            )
-    # calculate gear ratio
-    return sum(
-        part_numbers[0] * part_numbers[1]
-        for part_numbers in asterisks_to_part_numbers.values()
-        if len(part_numbers) == 2
-    )
-
-
-def record_asterisk_to_part_number(
-    digits_adj_to_asterisk: set[tuple[int, int]],
-    adjs_to_asterisks: dict[tuple[int, int], tuple[int, int]],
-    asterisks_to_part_numbers: dict[tuple[int, int], list[int]],
-    part_number: int,
-) -> None:
-    # there might be more than one asterisk adjacent to the digits
-    asterisks: set[tuple[int, int]] = {adjs_to_asterisks[digit_adj] for digit_adj in digits_adj_to_asterisk}
-    for asterisk in asterisks:
-        asterisks_to_part_numbers[asterisk].append(part_number)
+    return part_numbers_and_gear_ratio(schematic)[1]
 
 
 if __name__ == "__main__":
+    part_numbers, gear_ratio = part_numbers_and_gear_ratio(make_schematic("tests/day03.input"))
     # part 1
-    print(sum(get_part_numbers(make_schematic("tests/day03.input"))))  # noqa: T201
+    print(sum(part_numbers))  # noqa: T201
     # part 2
-    print(get_gear_ratio(make_schematic("tests/day03.input")))  # noqa: T201
+    print(gear_ratio)  # noqa: T201
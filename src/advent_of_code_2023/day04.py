@@ -1,45 +1,115 @@
-from dataclasses import dataclass
-from math import floor
+from array import array
+from collections.abc import Iterable, Iterator, Sequence
 
-from utils import read_lines
+from utils import map_line_chunks
+
+
+def to_bitmask(numbers_str: str) -> int:
+    mask = 0
+    for number_str in numbers_str.split():
+        mask |= 1 << int(number_str)
+    return mask
 
 
-@dataclass
 class Card:
-    winning_numbers: set[int]
-    have_numbers: set[int]
-    matches: int = 0
-    points: int = 0
+    """Winning and have numbers stored as integer bitmasks, bit n is set if number n is on the card."""
+
+    __slots__ = ("winning_mask", "have_mask", "matches")
+
+    def __init__(self, winning_mask: int, have_mask: int):
+        self.winning_mask = winning_mask
+        self.have_mask = have_mask
+        self.matches = bin(winning_mask & have_mask).count("1")
+
+    @property
+    def points(self) -> int:
+        return 2**self.matches - 1
 
-    def __init__(self, winning_numbers: set[int], have_numbers: set[int]):
-        self.winning_numbers = winning_numbers
-        self.have_numbers = have_numbers
-        self.matches = len(self.winning_numbers & self.have_numbers)
-        self.points = floor(2**self.matches - 1)
+    def __repr__(self) -> str:
+        return f"Card({self.winning_mask:#x}, {self.have_mask:#x}, matches={self.matches})"
 
 
 def parse_line(line: str) -> Card:
     _, numbers_str = line.split(":")
     winning_numbers_str, have_numbers_str = numbers_str.split("|")
-    return Card(
-        winning_numbers={int(winning_number_str) for winning_number_str in winning_numbers_str.split()},
-        have_numbers={int(have_number_str) for have_number_str in have_numbers_str.split()},
-    )
+    return Card(winning_mask=to_bitmask(winning_numbers_str), have_mask=to_bitmask(have_numbers_str))
+
+
+def count_matches(lines: Iterable[str]) -> array:
+    """Packed match counts for all cards, without keeping a Card per line."""
+    return array("H", (parse_line(line).matches for line in lines))
+
+
+def read_matches(file_name: str, workers: int = None) -> array:
+    """Match counts of every card of file_name, counted per chunk with map_line_chunks and concatenated in order."""
+    matches = array("H")
+    for chunk_matches in map_line_chunks(file_name, count_matches, workers=workers):
+        matches.extend(chunk_matches)
+    return matches
+
+
+def count_cards(matches: Sequence[int]) -> int:
+    """
+    Count original and won cards given the number of matches of each card.
+
+    Card i adds its count to each of the next matches[i] cards, which is recorded as a range
+    update on a difference array, so the cascade is O(n) regardless of the match counts.
+    """
+    diff = [0] * (len(matches) + 1)
+    total = 0
+    count = 0
+    for i, card_matches in enumerate(matches):
+        # one original card plus the copies won from previous cards
+        count += diff[i]
+        card_count = count + 1
+        total += card_count
+        if card_matches:
+            diff[i + 1] += card_count
+            diff[min(i + 1 + card_matches, len(matches))] -= card_count
+    return total
 
 
 def count_original_and_won_cards(cards: list[Card]) -> int:
-    cards_count = [1] * len(cards)
-    for i in range(len(cards)):
-        for j in range(1, cards[i].matches + 1):
-            cards_count[i + j] += cards_count[i]
-    return sum(cards_count)
+    return count_cards([card.matches for card in cards])
+
+
+def read_cards(file_name: str) -> Iterator[Card]:
+    with open(file_name) as file:
+        for line in file:
+            yield parse_line(line)
+
+
+def running_card_totals(cards: Iterable[Card]) -> Iterator[int]:
+    """
+    Yield the running count of original and won cards after each card of a stream.
+
+    Same cascade as count_cards, but the difference array is kept in a ring buffer that only
+    spans the largest match count seen so far, so memory does not grow with the stream.
+    """
+    ring = [0, 0]
+    pos = 0
+    total = 0
+    count = 0
+    for card in cards:
+        if card.matches + 2 > len(ring):
+            # rotate so the current card is at index 0, then grow
+            ring = ring[pos:] + ring[:pos] + [0] * (card.matches + 2 - len(ring))
+            pos = 0
+        count += ring[pos]
+        ring[pos] = 0
+        card_count = count + 1
+        total += card_count
+        if card.matches:
+            ring[(pos + 1) % len(ring)] += card_count
+            ring[(pos + 1 + card.matches) % len(ring)] -= card_count
+        pos = (pos + 1) % len(ring)
+        yield total
 
 
 if __name__ == "__main__":
     # part 1
-    lines = read_lines("tests/day04.input")
-    cards = [parse_line(line) for line in lines]
-    print(sum(card.points for card in cards))  # noqa: T201
+    matches = read_matches("tests/day04.input")
+    print(sum(2**card_matches - 1 for card_matches in matches))  # noqa: T201
 
     # part 2
-    print(count_original_and_won_cards(cards))  # noqa: T201
+    print(count_cards(matches))  # noqa: T201
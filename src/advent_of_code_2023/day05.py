@@ -1,7 +1,15 @@
+from bisect import bisect_right
+from collections.abc import Iterable, Iterator, Sequence
 from dataclasses import dataclass
+from math import inf
 
 from utils import read_lines
 
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, only used for batched lookups
+    np = None
+
 
 @dataclass
 class Mapping:
@@ -39,53 +47,131 @@ def fill_in_gaps(mappings: list[Mapping]) -> list[Mapping]:
     return contiguous_mappings
 
 
+class PiecewiseLinear:
+    """
+    Function x -> x + offsets[i] where starts[i] <= x < starts[i + 1], defined for x >= starts[0].
+
+    starts is sorted, the last piece extends to infinity.
+    """
+
+    def __init__(self, starts: list[int], offsets: list[int]):
+        self.starts = starts
+        self.offsets = offsets
+
+    @classmethod
+    def from_mappings(cls, mappings: list[Mapping]) -> "PiecewiseLinear":
+        # mappings are contiguous and sorted (see fill_in_gaps), numbers past the last one map to themselves
+        starts = [mapping.src for mapping in mappings] + [mappings[-1].src + mappings[-1].offset]
+        offsets = [mapping.dest - mapping.src for mapping in mappings] + [0]
+        return cls(starts, offsets).coalesce()
+
+    def __repr__(self) -> str:
+        return f"PiecewiseLinear({self.starts}, {self.offsets})"
+
+    def offset_at(self, num: int) -> int:
+        piece = bisect_right(self.starts, num) - 1
+        if piece < 0:
+            msg = f"{num} is below the domain starting at {self.starts[0]}"
+            raise ValueError(msg)
+        return self.offsets[piece]
+
+    def __call__(self, num: int) -> int:
+        return num + self.offset_at(num)
+
+    def map_many(self, nums: Sequence[int]) -> Sequence[int]:
+        """Batched lookup, a single searchsorted when numpy is available."""
+        if np is None:
+            return [self(num) for num in nums]
+        nums = np.asarray(nums, dtype=np.int64)
+        pieces = np.searchsorted(np.asarray(self.starts, dtype=np.int64), nums, side="right") - 1
+        if len(pieces) and pieces.min() < 0:
+            msg = f"{nums.min()} is below the domain starting at {self.starts[0]}"
+            raise ValueError(msg)
+        return nums + np.asarray(self.offsets, dtype=np.int64)[pieces]
+
+    def coalesce(self) -> "PiecewiseLinear":
+        """Merge neighboring pieces with the same offset."""
+        starts, offsets = [self.starts[0]], [self.offsets[0]]
+        for start, offset in zip(self.starts[1:], self.offsets[1:]):
+            if offset != offsets[-1]:
+                starts.append(start)
+                offsets.append(offset)
+        return PiecewiseLinear(starts, offsets)
+
+    def then(self, other: "PiecewiseLinear") -> "PiecewiseLinear":
+        """Returns the composition x -> other(self(x))."""
+        starts, offsets = [], []
+        ends = self.starts[1:] + [inf]
+        for start, end, offset in zip(self.starts, ends, self.offsets):
+            # split the image [start + offset, end + offset) by other's breakpoints
+            j = max(bisect_right(other.starts, start + offset) - 1, 0)
+            while j < len(other.starts) and other.starts[j] < end + offset:
+                starts.append(max(start, other.starts[j] - offset))
+                offsets.append(offset + other.offsets[j])
+                j += 1
+        return PiecewiseLinear(starts, offsets).coalesce()
+
+
+class RangeSet:
+    """Set of integers stored as sorted, disjoint and non-adjacent half open intervals."""
+
+    def __init__(self, ranges: Iterable[range] = ()):
+        self.starts: list[int] = []
+        self.stops: list[int] = []
+        for start, stop in sorted((r.start, r.stop) for r in ranges if r.start < r.stop):
+            if self.stops and start <= self.stops[-1]:
+                # overlapping or adjacent, coalesce into the previous interval
+                self.stops[-1] = max(self.stops[-1], stop)
+            else:
+                self.starts.append(start)
+                self.stops.append(stop)
+
+    def __repr__(self) -> str:
+        return f"RangeSet({list(self)})"
+
+    def __iter__(self) -> Iterator[range]:
+        return map(range, self.starts, self.stops)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def min(self) -> int:
+        return self.starts[0]
+
+    def split(self, breakpoints: list[int]) -> Iterator[range]:
+        """Yield the intervals cut at every breakpoint (sorted) that falls strictly inside them."""
+        for start, stop in zip(self.starts, self.stops):
+            i = bisect_right(breakpoints, start)
+            while i < len(breakpoints) and breakpoints[i] < stop:
+                yield range(start, breakpoints[i])
+                start = breakpoints[i]
+                i += 1
+            yield range(start, stop)
+
+    def map(self, function: PiecewiseLinear) -> "RangeSet":
+        """Image of the set under function, normalized."""
+        pieces = []
+        for piece in self.split(function.starts):
+            offset = function.offset_at(piece.start)
+            pieces.append(range(piece.start + offset, piece.stop + offset))
+        return RangeSet(pieces)
+
+
 class SrcDestCategory:
     mappings: list[Mapping]
 
     def __init__(self, mappings: list[Mapping]):
         self.mappings = fill_in_gaps(mappings)
+        self.function = PiecewiseLinear.from_mappings(self.mappings)
 
     def __repr__(self) -> str:
         return "SrcDestCategory({self.mappings})"
 
     def out_num(self, in_num: int) -> int:
-        for mapping in self.mappings:
-            if mapping.has(in_num):
-                return mapping.dest + (in_num - mapping.src)
-        # no mapping found, src and dest are the same number
-        return in_num
+        return self.function(in_num)
 
     def get_out_ranges(self, in_ranges: list[range]) -> list[range]:
-        # in_ranges are sorted by start, but are not necessarily contiguous
-        out_ranges = []
-        r, m = 0, 0
-        while r < len(in_ranges) and m < len(self.mappings):
-            mapping = self.mappings[m]
-            if not mapping.has(in_ranges[r].start):
-                # current mapping doesn't cover current in_range's start
-                m += 1
-            elif not mapping.has(in_ranges[r].stop - 1):
-                # current mapping covers current in_range's start, but not its stop
-                out_ranges.append(
-                    range(
-                        mapping.dest + (in_ranges[r].start - mapping.src),
-                        mapping.dest + mapping.offset,
-                    )
-                )
-                # adjust current in_range's start to current mapping's end
-                in_ranges[r] = range(mapping.src + mapping.offset, in_ranges[r].stop)
-                m += 1
-            else:
-                # current mapping covers current in_range's start and stop
-                out_ranges.append(
-                    range(
-                        mapping.dest + (in_ranges[r].start - mapping.src),
-                        mapping.dest + (in_ranges[r].stop - mapping.src),
-                    )
-                )
-                r += 1
-        out_ranges.sort(key=lambda out_range: out_range.start)
-        return out_ranges
+        return list(RangeSet(in_ranges).map(self.function))
 
 
 def part_1_parse_seeds(input_part: str) -> list[int]:
@@ -106,10 +192,16 @@ def parse_categories(input_parts: list[str]) -> tuple[list[int], list[SrcDestCat
     return categories
 
 
+def compose_categories(categories: list[SrcDestCategory]) -> PiecewiseLinear:
+    """Compile the whole seed-to-location chain into a single piecewise linear function."""
+    function = categories[0].function
+    for category in categories[1:]:
+        function = function.then(category.function)
+    return function
+
+
 def part1_min_location_number(seeds: list[int], categories: list[SrcDestCategory]) -> int:
-    for category in categories:
-        seeds = [category.out_num(seed) for seed in seeds]
-    return min(seeds)
+    return int(min(compose_categories(categories).map_many(seeds)))
 
 
 def parse_seed_ranges(input_part: str) -> list[range]:
@@ -122,10 +214,10 @@ def parse_seed_ranges(input_part: str) -> list[range]:
 
 
 def part2_min_location_number(seed_ranges: list[range], categories: list[SrcDestCategory]) -> int:
-    seed_ranges.sort(key=lambda seed_range: seed_range.start)
+    ranges = RangeSet(seed_ranges)
     for category in categories:
-        seed_ranges = category.get_out_ranges(seed_ranges)
-    return seed_ranges[0].start
+        ranges = ranges.map(category.function)
+    return ranges.min()
 
 
 if __name__ == "__main__":
@@ -1,8 +1,25 @@
+import hashlib
+import heapq
+import mmap
+import os
+import tempfile
+from array import array
 from collections import Counter
+from collections.abc import Iterable, Iterator, Sequence
+from contextlib import ExitStack
 from enum import IntEnum
+from functools import lru_cache
+from itertools import count, product
+from pathlib import Path
+from typing import Optional
 
 from utils import read_lines
 
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, only used to rank hands in bulk
+    np = None
+
 
 class HandType(IntEnum):
     HIGH_CARD = 0
@@ -60,34 +77,260 @@ def get_hand_type(labels: str, *, joker_active: bool) -> HandType:
     return HandType.ONE_PAIR
 
 
+LABEL_ORDER = "23456789TJQKA"
+JOKER_LABEL_ORDER = "J23456789TQKA"
+LABEL_RANKS = {label: rank for rank, label in enumerate(LABEL_ORDER)}
+JOKER_LABEL_RANKS = {label: rank for rank, label in enumerate(JOKER_LABEL_ORDER)}
+
+
+# hand code: the labels as a base 13 number (digits are LABEL_ORDER ranks), used to index the table
+NUM_HAND_CODES = 13**5
+# bump when get_hand_type, LABEL_ORDER or the table layout change, so saved tables are rebuilt
+HAND_TYPE_TABLE_VERSION = 2
+HAND_TYPE_TABLE_PATH = (
+    Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache"))
+    / "advent_of_code_2023"
+    / f"day07_hand_types.v{HAND_TYPE_TABLE_VERSION}.bin"
+)
+# the saved table starts with a digest of the version, the label order and the table itself
+DIGEST_BYTES = 16
+
+
+def build_hand_type_table() -> bytes:
+    """HandType of every hand code, without jokers followed by with jokers."""
+    table = bytearray(2 * NUM_HAND_CODES)
+    for joker_active in (False, True):
+        offset = joker_active * NUM_HAND_CODES
+        for code, labels in enumerate(product(LABEL_ORDER, repeat=5)):
+            table[offset + code] = get_hand_type(labels, joker_active=joker_active)
+    return bytes(table)
+
+
+def hand_type_table_digest(table) -> bytes:
+    digest = hashlib.blake2b(f"{HAND_TYPE_TABLE_VERSION}:{LABEL_ORDER}".encode(), digest_size=DIGEST_BYTES)
+    digest.update(table)
+    return digest.digest()
+
+
+def save_hand_type_table(path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    table = build_hand_type_table()
+    partial_path = path.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        with open(partial_path, "wb") as file:
+            file.write(hand_type_table_digest(table))
+            file.write(table)
+        # atomic, concurrent runs never see a partially written table
+        os.replace(partial_path, path)
+    except BaseException:
+        partial_path.unlink(missing_ok=True)
+        raise
+
+
+def read_hand_type_table(path: Path) -> Optional[memoryview]:
+    """Memory mapped table saved at path, or None if missing or its digest does not match."""
+    if not path.exists() or path.stat().st_size != DIGEST_BYTES + 2 * NUM_HAND_CODES:
+        return None
+    with open(path, "rb") as file:
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    table = memoryview(buffer)[DIGEST_BYTES:]
+    if buffer[:DIGEST_BYTES] != hand_type_table_digest(table):
+        table.release()
+        buffer.close()
+        return None
+    return table
+
+
+@lru_cache(maxsize=None)
+def load_hand_type_table(path: Optional[Path] = None) -> memoryview:
+    """
+    Memory map the hand type table at path (HAND_TYPE_TABLE_PATH by default), building and saving it first if missing.
+
+    A saved table whose digest does not match (older version, other label order, corrupted) is rebuilt.
+    If the cache cannot be read or written (read-only home, sandbox), the table is built in memory.
+    """
+    if path is None:
+        path = HAND_TYPE_TABLE_PATH
+    try:
+        table = read_hand_type_table(path)
+        if table is None:
+            save_hand_type_table(path)
+            table = read_hand_type_table(path)
+    except OSError:
+        table = None
+    return memoryview(build_hand_type_table()) if table is None else table
+
+
+def classify_hand(labels: str, *, joker_active: bool) -> HandType:
+    code = 0
+    for label in labels:
+        code = code * 13 + LABEL_RANKS[label]
+    return HandType(load_hand_type_table()[joker_active * NUM_HAND_CODES + code])
+
+
+def hand_key(labels: str, *, joker_active: bool) -> int:
+    """
+    Pack a hand into a single int that sorts like the hand.
+
+    The hand type takes the bits above 20, then each label's rank takes 4 bits, first label highest.
+    """
+    ranks = JOKER_LABEL_RANKS if joker_active else LABEL_RANKS
+    code = 0
+    key = 0
+    for label in labels:
+        code = code * 13 + LABEL_RANKS[label]
+        key = key << 4 | ranks[label]
+    return load_hand_type_table()[joker_active * NUM_HAND_CODES + code] << 20 | key
+
+
 class Hand:
     def __init__(self, labels: str, bid: int, *, joker_active: bool = False):
         self.labels = labels
         self.bid = bid
-        if joker_active:
-            self.label_order = "J23456789TQKA"
-        else:
-            self.label_order = "23456789TJQKA"
-        self.hand_type = get_hand_type(labels, joker_active=joker_active)
+        self.hand_type = classify_hand(labels, joker_active=joker_active)
+        self.key = hand_key(labels, joker_active=joker_active)
 
     def __lt__(self, other: "Hand") -> bool:
-        if self.hand_type < other.hand_type:
-            return True
-        if self.hand_type == other.hand_type:
-            for label, other_label in zip(self.labels, other.labels):
-                if self.label_order.index(label) < self.label_order.index(other_label):
-                    return True
-                if self.label_order.index(label) > self.label_order.index(other_label):
-                    return False
-        return False
+        return self.key < other.key
 
     def __repr__(self):
         return f"Hand({self.labels}, {self.hand_type}, {self.bid})"
 
 
-# For part 1, need to set joker_active to False.
-# For part 2, need to set joker_active to True.
-lines = read_lines("tests/day07.input")
-hands = [Hand(labels, int(bid_str), joker_active=True) for labels, bid_str in [line.split() for line in lines]]
-hands.sort()
-print(sum(hand.bid * rank for rank, hand in enumerate(hands, start=1)))  # noqa: T201
+def parse_hands(lines: Iterable[str]) -> tuple[list[int], list[int], list[int]]:
+    """Returns the keys without jokers, the keys with jokers and the bids, from a single parse."""
+    keys, joker_keys, bids = [], [], []
+    for line in lines:
+        labels, bid_str = line.split()
+        keys.append(hand_key(labels, joker_active=False))
+        joker_keys.append(hand_key(labels, joker_active=True))
+        bids.append(int(bid_str))
+    return keys, joker_keys, bids
+
+
+def total_winnings(keys: Sequence[int], bids: Sequence[int]) -> int:
+    """
+    Sum of bid * rank, ranking by key with one bulk sort (numpy argsort when available).
+
+    The sort is stable, so equal hands are ranked in input order.
+    """
+    if np is None:
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        return sum(bids[i] * rank for rank, i in enumerate(order, start=1))
+    order = np.argsort(np.asarray(keys, dtype=np.int64), kind="stable")
+    ranked_bids = np.asarray(bids, dtype=np.int64)[order]
+    return int(ranked_bids @ np.arange(1, len(keys) + 1, dtype=np.int64))
+
+
+# external sort entries: hand key in the high bits, bid in the low 32 bits
+BID_BITS = 32
+BID_MASK = (1 << BID_BITS) - 1
+ENTRY_BYTES = array("Q").itemsize
+# rough bytes per entry while a run is sorted in memory (python int in a list, plus the array slot)
+BYTES_PER_SORTED_ENTRY = 48
+# most runs merged at once, each holds an open file and a read buffer
+MAX_FAN_IN = 64
+
+
+def entry_key(entry: int) -> int:
+    return entry >> BID_BITS
+
+
+def write_run(entries: Iterable[int], run_dir: str, run_number: int, block_entries: int) -> str:
+    """Write sorted entries to a run file, block_entries at a time."""
+    path = os.path.join(run_dir, f"run{run_number}.bin")
+    with open(path, "wb") as file:
+        block = array("Q")
+        for entry in entries:
+            block.append(entry)
+            if len(block) == block_entries:
+                block.tofile(file)
+                block = array("Q")
+        block.tofile(file)
+    return path
+
+
+def read_run(file, block_entries: int) -> Iterator[int]:
+    """Yield the entries of a sorted run, reading block_entries at a time."""
+    while True:
+        block = array("Q")
+        try:
+            block.fromfile(file, block_entries)
+        except EOFError:
+            # fewer than block_entries left, block holds whatever was read
+            pass
+        if not block:
+            return
+        yield from block
+
+
+def merge_runs(paths: list[str], block_entries: int) -> Iterator[int]:
+    """Merge sorted runs; heapq.merge is stable, so equal hands come out in the order of their runs."""
+    with ExitStack() as stack:
+        runs = [read_run(stack.enter_context(open(path, "rb")), block_entries) for path in paths]
+        yield from heapq.merge(*runs, key=entry_key)
+
+
+def external_total_winnings(
+    lines: Iterable[str],
+    *,
+    joker_active: bool,
+    memory_budget: int = 64 << 20,
+    temp_dir: str = None,
+    max_fan_in: int = MAX_FAN_IN,
+) -> int:
+    """
+    Sum of bid * rank for hands that do not fit in memory.
+
+    Lines are encoded and sorted in runs sized to memory_budget (in bytes, approximate), each run is
+    spilled to a temporary file.  Runs are then merged max_fan_in at a time into longer runs until
+    max_fan_in or fewer remain, and those are merged while the winnings are accumulated.
+    Runs are cut in input order, sorted stably by hand key and always merged with their neighbours in
+    order, so equal hands are ranked in input order, like total_winnings.
+    """
+    if max_fan_in < 2:
+        msg = f"max_fan_in must be at least 2, got {max_fan_in}"
+        raise ValueError(msg)
+    run_entries = max(memory_budget // BYTES_PER_SORTED_ENTRY, 1)
+    # split the budget between the read buffers of the merged runs and the write buffer
+    block_entries = max(memory_budget // (ENTRY_BYTES * (max_fan_in + 1)), 1)
+    with tempfile.TemporaryDirectory(dir=temp_dir) as run_dir:
+        run_paths = []
+        run_numbers = count()
+        entries = array("Q")
+        for line in lines:
+            labels, bid_str = line.split()
+            bid = int(bid_str)
+            if bid > BID_MASK:
+                msg = f"bid {bid} does not fit in {BID_BITS} bits"
+                raise ValueError(msg)
+            entries.append(hand_key(labels, joker_active=joker_active) << BID_BITS | bid)
+            if len(entries) == run_entries:
+                run_paths.append(write_run(sorted(entries, key=entry_key), run_dir, next(run_numbers), block_entries))
+                entries = array("Q")
+        if entries:
+            run_paths.append(write_run(sorted(entries, key=entry_key), run_dir, next(run_numbers), block_entries))
+        del entries
+        while len(run_paths) > max_fan_in:
+            merged_paths = []
+            for start in range(0, len(run_paths), max_fan_in):
+                group = run_paths[start : start + max_fan_in]
+                if len(group) == 1:
+                    merged_paths.append(group[0])
+                    continue
+                merged = merge_runs(group, block_entries)
+                merged_paths.append(write_run(merged, run_dir, next(run_numbers), block_entries))
+                for path in group:
+                    os.remove(path)
+            run_paths = merged_paths
+        return sum(
+            (entry & BID_MASK) * rank for rank, entry in enumerate(merge_runs(run_paths, block_entries), start=1)
+        )
+
+
+if __name__ == "__main__":
+    keys, joker_keys, bids = parse_hands(read_lines("tests/day07.input"))
+    # part 1
+    print(total_winnings(keys, bids))  # noqa: T201
+    # part 2
+    print(total_winnings(joker_keys, bids))  # noqa: T201
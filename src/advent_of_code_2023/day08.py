@@ -1,10 +1,12 @@
-from collections.abc import Iterator
+import re
+from array import array
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
-from itertools import cycle
-from math import lcm
+from math import gcd, lcm
 from typing import Optional
 
-from utils import read_lines
+from utils import find_cycle, read_lines
 
 
 @dataclass
@@ -17,14 +19,17 @@ class Node:
         return self.label
 
 
-def parse_network(lines: list[str]) -> dict[str, Node]:
-    # extract labels from lines
+def parse_label_triples(lines: list[str]) -> list[tuple[str, str, str]]:
+    """Returns (node, left, right) labels of each line."""
     label_triples = []
-    for formatted_line in lines:
-        line = formatted_line.replace(" ", "").replace("(", "").replace(")", "")
-        node_label, remaining = line.split("=")
-        left_label, right_label = remaining.split(",")
+    for line in lines:
+        node_label, left_label, right_label = re.findall(r"\w+", line)
         label_triples.append((node_label, left_label, right_label))
+    return label_triples
+
+
+def parse_network(lines: list[str]) -> dict[str, Node]:
+    label_triples = parse_label_triples(lines)
     # construct network
     network = {}
     for node_label, _, _ in label_triples:
@@ -57,62 +62,195 @@ def traverse(
                 return node, steps
 
 
-def step_progression_iter(step_progression: list[tuple[str, int]], cycle_start_label: str) -> Iterator[int]:
-    in_cycle = False
-    saved = []
-    for node_label, steps in step_progression:
-        yield steps
-        if node_label == cycle_start_label:
-            in_cycle = True
-        if in_cycle:
-            saved.append((node_label, steps))
-    while saved:
-        for _, steps in saved:
-            yield steps
-
-
-def get_step_progression(start_node: Node, end_node_labels: set[str]) -> Iterator[int]:
-    """Returns step progression for a single start node."""
-    from_node = start_node
-    visited_node_labels = set()
-    step_progression: list[tuple[str, int]] = []
-    while True:
-        to_node, steps = traverse(network, navigator, start_node_label=from_node.label, end_node_labels=end_node_labels)
-        to_node_label = to_node.label
-        if to_node_label not in visited_node_labels:
-            visited_node_labels.add(to_node_label)
-            step_progression.append((from_node.label, steps))
-            from_node = to_node
-        else:
-            # cycle found
-            step_progression.append((from_node.label, steps))
-            # notice the steps between all (from_node, to_node) is the same
-            print(step_progression)
-            return step_progression_iter(step_progression, to_node_label)
-
-
-def simultaneous_traverse(network: dict[str, Node]) -> int:
-    start_nodes = [node for node in network.values() if node.label.endswith("A")]
-    end_nodes = [node for node in network.values() if node.label.endswith("Z")]
-    end_node_labels = {node.label for node in end_nodes}
-    progressions = []
-    for start_node in start_nodes:
-        progressions.append(get_step_progression(start_node, end_node_labels))
-    steps_within_a_cycle = [next(progression) for progression in progressions]
-    # since each progression has a single distinct step, the lcm of these steps would
-    # allow reaching end nodes simultaneously.  In other words, the input data
-    # reduced the complexity of the problem quite a bit.
-    # if at least one progression has more than one distinct step, then the use of
-    # next(progression) would be more prominent/appriopriate.
-    return lcm(*steps_within_a_cycle)
-
-
-lines = read_lines("tests/day08.input")
-navigator = cycle(lines[0].strip())
-network = parse_network(lines[2:])
-# part 1
-print(traverse(network, navigator)[1])
-
-# part 2
-navigator = cycle(lines[0].strip())
-print(simultaneous_traverse(network))
+class JumpTable:
+    """
+    Network compiled to integer arrays, with binary lifting over full passes of the instructions.
+
+    Labels are interned to ids.  jumps[k][node] is the node reached after 2**k passes starting at
+    node, and hits_end[k][node] tells whether an end node is reached during those passes.
+    """
+
+    def __init__(self, instructions: str, label_triples: list[tuple[str, str, str]], end_node_labels: Iterable[str]):
+        self.instructions = instructions
+        self.labels = [node_label for node_label, _, _ in label_triples]
+        self.ids = {label: node_id for node_id, label in enumerate(self.labels)}
+        num_nodes = len(self.labels)
+        self.left = array("i", (self.ids[left_label] for _, left_label, _ in label_triples))
+        self.right = array("i", (self.ids[right_label] for _, _, right_label in label_triples))
+        self.is_end = bytearray(num_nodes)
+        for label in end_node_labels:
+            self.is_end[self.ids[label]] = 1
+
+        # walk one pass from every node: where it ends, and the first step (1-based) landing on an end node
+        pass_next = array("i", [0]) * num_nodes
+        self.first_end = array("i", [-1]) * num_nodes
+        for start in range(num_nodes):
+            node = start
+            for step, direction in enumerate(instructions, start=1):
+                node = self.left[node] if direction == "L" else self.right[node]
+                if self.first_end[start] == -1 and self.is_end[node]:
+                    self.first_end[start] = step
+            pass_next[start] = node
+
+        self.jumps = [pass_next]
+        self.hits_end = [bytearray(first_end != -1 for first_end in self.first_end)]
+        # pass-level states repeat within num_nodes passes, so that many doublings cover any end node search
+        self._extend(num_nodes.bit_length() + 1)
+
+    def _extend(self, levels: int) -> None:
+        """Add doubling levels until there are at least levels of them."""
+        num_nodes = len(self.labels)
+        while len(self.jumps) < levels:
+            jump, hits = self.jumps[-1], self.hits_end[-1]
+            self.jumps.append(array("i", (jump[jump[node]] for node in range(num_nodes))))
+            self.hits_end.append(bytearray(hits[node] | hits[jump[node]] for node in range(num_nodes)))
+
+    def step(self, node: int, direction: str) -> int:
+        return self.left[node] if direction == "L" else self.right[node]
+
+    def end_offsets(self, node: int) -> list[int]:
+        """Steps (1-based) within one pass from node that land on an end node."""
+        offsets = []
+        for step, direction in enumerate(self.instructions, start=1):
+            node = self.step(node, direction)
+            if self.is_end[node]:
+                offsets.append(step)
+        return offsets
+
+    def position_after(self, start_node_label: str, steps: int) -> str:
+        """Label of the node reached after steps steps."""
+        passes, remaining = divmod(steps, len(self.instructions))
+        self._extend(passes.bit_length())
+        node = self.ids[start_node_label]
+        for k in range(passes.bit_length()):
+            if passes >> k & 1:
+                node = self.jumps[k][node]
+        for direction in self.instructions[:remaining]:
+            node = self.step(node, direction)
+        return self.labels[node]
+
+    def steps_to_end(self, start_node_label: str) -> Optional[int]:
+        """Number of steps to first reach an end node, None if it is never reached."""
+        node = self.ids[start_node_label]
+        passes = 0
+        for k in range(len(self.jumps) - 1, -1, -1):
+            if not self.hits_end[k][node]:
+                node = self.jumps[k][node]
+                passes += 1 << k
+        if self.first_end[node] == -1:
+            return None
+        return passes * len(self.instructions) + self.first_end[node]
+
+
+@dataclass
+class Orbit:
+    """
+    Steps at which a ghost stands on an end node.
+
+    Every end step below tail happens once, every end step in [tail, tail + cycle_length) repeats
+    every cycle_length steps.
+    """
+
+    tail: int
+    cycle_length: int
+    end_steps: list[int]
+
+    def reaches_end_at(self, steps: int) -> bool:
+        if steps < self.tail:
+            return steps in self.end_steps
+        return self.tail + (steps - self.tail) % self.cycle_length in self.end_steps
+
+
+def find_orbit(table: JumpTable, start_node_label: str) -> Orbit:
+    """
+    Detect the cycle of the (node, instruction index) states reached from start_node_label.
+
+    States at instruction index 0 are the nodes at the start of each pass, so the cycle is found
+    on those, collecting end steps pass by pass.
+    """
+    num_instructions = len(table.instructions)
+    passes = find_cycle(table.jumps[0].__getitem__, table.ids[start_node_label], value=table.end_offsets)
+    tail = passes.mu * num_instructions
+    cycle_length = passes.lam * num_instructions
+    end_steps = []
+    for pass_number, offsets in enumerate(passes.values):
+        for offset in offsets:
+            steps = pass_number * num_instructions + offset
+            # the last step of the cycle is back on its first state, fold such steps into [tail, tail + cycle_length)
+            end_steps.append(steps if steps < tail else tail + (steps - tail) % cycle_length)
+    return Orbit(tail, cycle_length, end_steps)
+
+
+def crt(residue1: int, modulus1: int, residue2: int, modulus2: int) -> Optional[tuple[int, int]]:
+    """Generalized chinese remainder theorem for non coprime moduli, None if there is no solution."""
+    g = gcd(modulus1, modulus2)
+    if (residue2 - residue1) % g:
+        return None
+    modulus = modulus1 // g * modulus2
+    k = (residue2 - residue1) // g * pow(modulus1 // g, -1, modulus2 // g) % (modulus2 // g)
+    return (residue1 + modulus1 * k) % modulus, modulus
+
+
+def earliest_common_step(orbits: list[Orbit]) -> Optional[int]:
+    """Smallest step count (at least 1) at which every orbit is on an end node, None if never."""
+    # before the longest tail, a common step must be one of the one-off steps of that orbit
+    longest = max(orbits, key=lambda orbit: orbit.tail)
+    for steps in sorted(longest.end_steps):
+        if steps >= longest.tail:
+            break
+        if steps >= 1 and all(orbit.reaches_end_at(steps) for orbit in orbits):
+            return steps
+    # from there on every orbit is periodic, combine the residues of each orbit's cycle
+    residues, modulus = [0], 1
+    for orbit in orbits:
+        orbit_residues = {steps % orbit.cycle_length for steps in orbit.end_steps if steps >= orbit.tail}
+        combined = set()
+        for residue in residues:
+            for orbit_residue in orbit_residues:
+                if solution := crt(residue, modulus, orbit_residue, orbit.cycle_length):
+                    combined.add(solution[0])
+        residues, modulus = list(combined), lcm(modulus, orbit.cycle_length)
+    if not residues:
+        return None
+    first = max(longest.tail, 1)
+    return min(residue + (first - residue + modulus - 1) // modulus * modulus for residue in residues)
+
+
+# set in each worker process by _attach_table
+worker_table: Optional[JumpTable] = None
+
+
+def _attach_table(table: JumpTable) -> None:
+    global worker_table  # noqa: PLW0603
+    worker_table = table
+
+
+def _find_worker_orbit(start_node_label: str) -> Orbit:
+    return find_orbit(worker_table, start_node_label)
+
+
+def simultaneous_traverse(table: JumpTable, workers: Optional[int] = None) -> Optional[int]:
+    """
+    Steps until all ghosts, starting on every node ending with A, are on end nodes at once.
+
+    The orbit of each ghost is found in a process pool, every worker receives the table once on start up.
+    """
+    start_node_labels = [label for label in table.labels if label.endswith("A")]
+    if workers == 1 or len(start_node_labels) == 1:
+        orbits = [find_orbit(table, start_node_label) for start_node_label in start_node_labels]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach_table, initargs=(table,)) as executor:
+            orbits = list(executor.map(_find_worker_orbit, start_node_labels))
+    return earliest_common_step(orbits)
+
+
+if __name__ == "__main__":
+    lines = read_lines("tests/day08.input")
+    instructions = lines[0].strip()
+    label_triples = parse_label_triples(lines[2:])
+    # part 1
+    print(JumpTable(instructions, label_triples, ["ZZZ"]).steps_to_end("AAA"))  # noqa: T201
+
+    # part 2
+    end_node_labels = [node_label for node_label, _, _ in label_triples if node_label.endswith("Z")]
+    print(simultaneous_traverse(JumpTable(instructions, label_triples, end_node_labels)))  # noqa: T201
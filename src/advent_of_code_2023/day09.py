@@ -1,24 +1,110 @@
-from utils import read_lines
+from collections import defaultdict
+from collections.abc import Iterable
+from functools import lru_cache
+from math import comb
 
+from utils import map_line_chunks
 
-def predict_next(numbers: list[int]):
-    if len(set(numbers)) == 1:
-        return numbers[0]
-    else:
-        return predict_next([numbers[i + 1] - numbers[i] for i in range(len(numbers) - 1)]) + numbers[-1]
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, only used for batched extrapolation
+    np = None
+
+
+@lru_cache(maxsize=None)
+def extrapolation_weights(length: int) -> tuple[tuple[int, ...], tuple[int, ...]]:
+    """
+    Weights such that the next (and previous) value is the dot product of the weights with the numbers.
+
+    Extrapolating through the difference pyramid is the same as extrapolating the polynomial of degree
+    length - 1 through the numbers, whose weights are alternating binomial coefficients.
+    """
+    next_weights = tuple((-1) ** (length - 1 - i) * comb(length, i) for i in range(length))
+    prev_weights = tuple((-1) ** i * comb(length, i + 1) for i in range(length))
+    return next_weights, prev_weights
+
+
+def predict_next(numbers: list[int]) -> int:
+    return sum(weight * number for weight, number in zip(extrapolation_weights(len(numbers))[0], numbers))
 
 
 def parse_numbers(line: str) -> list[int]:
     return [int(number_str) for number_str in line.split()]
 
 
-def predict_prev(numbers: list[int]):
-    if len(set(numbers)) == 1:
-        return numbers[0]
-    else:
-        return numbers[0] - predict_prev([numbers[i + 1] - numbers[i] for i in range(len(numbers) - 1)])
+def predict_prev(numbers: list[int]) -> int:
+    return sum(weight * number for weight, number in zip(extrapolation_weights(len(numbers))[1], numbers))
+
+
+def extrapolate_many(rows: list[list[int]]) -> tuple[list[int], list[int]]:
+    """
+    Next and previous values of every row.
+
+    Rows of equal length are stacked and extrapolated together, as a matrix product with numpy when
+    available and the result is sure to fit in int64.
+    """
+    rows_by_length = defaultdict(list)
+    for row_number, row in enumerate(rows):
+        rows_by_length[len(row)].append(row_number)
+    next_values, prev_values = [0] * len(rows), [0] * len(rows)
+    for length, row_numbers in rows_by_length.items():
+        next_weights, prev_weights = extrapolation_weights(length)
+        group = [rows[row_number] for row_number in row_numbers]
+        largest = max(abs(number) for row in group for number in row)
+        if np is not None and largest * 2**length < 2**63:
+            matrix = np.array(group, dtype=np.int64)
+            group_next, group_prev = (matrix @ np.array([next_weights, prev_weights], dtype=np.int64).T).T.tolist()
+        else:
+            group_next = [sum(w * number for w, number in zip(next_weights, row)) for row in group]
+            group_prev = [sum(w * number for w, number in zip(prev_weights, row)) for row in group]
+        for row_number, next_number, prev_number in zip(row_numbers, group_next, group_prev):
+            next_values[row_number], prev_values[row_number] = next_number, prev_number
+    return next_values, prev_values
+
+
+def sum_extrapolated(lines: Iterable[str]) -> tuple[int, int]:
+    """Sums of the next and previous values of the rows in lines, grouped by length with extrapolate_many."""
+    next_values, prev_values = extrapolate_many([parse_numbers(line) for line in lines])
+    return sum(next_values), sum(prev_values)
+
+
+def process_file(file_name: str, workers: int = None) -> tuple[int, int]:
+    """Returns the sums of (part 1, part 2) extrapolated values, one chunk of the file at a time."""
+    chunk_sums = map_line_chunks(file_name, sum_extrapolated, workers=workers)
+    return sum(next_sum for next_sum, _ in chunk_sums), sum(prev_sum for _, prev_sum in chunk_sums)
+
+
+class SequencePredictor:
+    """
+    Online predictor for a growing sequence.
+
+    Only the trailing diagonal of the difference table (last value of every level) is kept, plus the
+    leading diagonal (first value of every level, fixed once the level exists), so appending a value
+    is O(depth) and predictions never rebuild the table.
+    """
+
+    def __init__(self, numbers: Iterable[int] = ()):
+        self.trailing: list[int] = []
+        self.leading: list[int] = []
+        for number in numbers:
+            self.append(number)
+
+    def append(self, number: int) -> None:
+        diff = number
+        for level, last in enumerate(self.trailing):
+            self.trailing[level], diff = diff, diff - last
+        # a new level starts with a single value, which is both its first and last
+        self.trailing.append(diff)
+        self.leading.append(diff)
+
+    def predict_next(self) -> int:
+        return sum(self.trailing)
+
+    def predict_prev(self) -> int:
+        return sum(first if level % 2 == 0 else -first for level, first in enumerate(self.leading))
 
 
-lines = read_lines("tests/day09.input")
-# print(sum(predict_next(parse_numbers(line)) for line in lines))
-print(sum(predict_prev(parse_numbers(line)) for line in lines))
+if __name__ == "__main__":
+    part1, part2 = process_file("tests/day09.input")
+    print(part1)  # noqa: T201
+    print(part2)  # noqa: T201
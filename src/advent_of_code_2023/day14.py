@@ -1,65 +1,116 @@
-from collections import deque
-
-from utils import read_lines
-
-
-def transpose(grid: tuple[str]) -> tuple[str]:
-    return tuple("".join(item) for item in zip(*grid))
-
-
-def tilt(row: str, direction: str = "L") -> str:
-    # split row into fragments by "#", then replace each fragment with "O" and "." according to the number of "O"s and "."s
-    if direction == "L":  # tilt left
-        return "#".join("O" * fragment.count("O") + "." * fragment.count(".") for fragment in row.split("#"))
-    if direction == "R":  # tilt right
-        return "#".join("." * fragment.count(".") + "O" * fragment.count("O") for fragment in row.split("#"))
-
-
-def spin_cycle(grid: tuple[str]) -> tuple[str]:
-    grid = tuple(tilt(row, direction="L") for row in transpose(grid))  # tilt North
-    grid = tuple(tilt(row, direction="L") for row in transpose(grid))  # tilt West
-    grid = tuple(tilt(row, direction="R") for row in transpose(grid))  # tilt South
-    grid = tuple(tilt(row, direction="R") for row in transpose(grid))  # tilt East
-    return grid
-
-
-def load_on_north_side(grid: tuple[str]) -> int:
-    return sum(grid[i].count("O") * (len(grid) - i) for i in range(len(grid)))
+from utils import find_cycle, read_lines
+
+CUBE_BITS = str.maketrans(".O#", "001")
+ROUNDED_BITS = str.maketrans(".O#", "010")
+
+
+class Platform:
+    """
+    Rounded rocks of a platform stored as a square bitboard, cube rocks never move.
+
+    Cell (row, col) is bit row * size + col, size is the larger side rounded up to a power of two (at
+    least 8) so the board splits into whole bytes per line and transposes in log2(size) delta swaps.
+    A state of the platform is just the int of rounded rock bits.
+    """
+
+    def __init__(self, grid: tuple[str]):
+        self.height, self.width = len(grid), len(grid[0])
+        self.size = 8
+        while self.size < max(self.height, self.width):
+            self.size *= 2
+        self.line_bytes = self.size // 8
+        # bit strings are most significant bit first, so each row is reversed
+        self.cubes = cubes = self._board([int(line[::-1].translate(CUBE_BITS), 2) for line in grid])
+        self.rounded = self._board([int(line[::-1].translate(ROUNDED_BITS), 2) for line in grid])
+        # transpose_masks[j]: cells (row, col) with bit j clear in row and set in col
+        self.transpose_masks = {}
+        j = self.size // 2
+        while j:
+            line = sum(1 << col for col in range(self.size) if col & j).to_bytes(self.line_bytes, "little")
+            empty = bytes(self.line_bytes)
+            masked_lines = (empty if row & j else line for row in range(self.size))
+            self.transpose_masks[j] = int.from_bytes(b"".join(masked_lines), "little")
+            j //= 2
+        # (start, length) of the runs between cube rocks of every row, and of every column
+        self.row_segments = self._segments(self._lines(cubes, self.height), self.width)
+        self.column_segments = self._segments(self._lines(self.transpose(cubes), self.width), self.height)
+
+    @staticmethod
+    def _segments(cube_lines: list[int], length: int) -> list[list[tuple[int, int]]]:
+        segments = []
+        for cube_line in cube_lines:
+            line_segments = []
+            start = 0
+            for end in [i for i in range(length) if cube_line >> i & 1] + [length]:
+                if end > start:
+                    line_segments.append((start, end - start))
+                start = end + 1
+            segments.append(line_segments)
+        return segments
+
+    def _lines(self, board: int, num_lines: int) -> list[int]:
+        buffer = board.to_bytes(self.size * self.line_bytes, "little")
+        return [
+            int.from_bytes(buffer[i * self.line_bytes : (i + 1) * self.line_bytes], "little") for i in range(num_lines)
+        ]
+
+    def _board(self, lines: list[int]) -> int:
+        return int.from_bytes(b"".join(line.to_bytes(self.line_bytes, "little") for line in lines), "little")
+
+    def transpose(self, board: int) -> int:
+        """Mirror the board along its diagonal, swapping off-diagonal blocks of halving sizes."""
+        for j, mask in self.transpose_masks.items():
+            delta = j * (self.size - 1)
+            swapped = (board ^ (board >> delta)) & mask
+            board ^= swapped ^ (swapped << delta)
+        return board
+
+    def _tilt_lines(self, board: int, segments: list[list[tuple[int, int]]], towards_high_bits: bool) -> int:
+        """Move the rocks of each segment of each line into one packed block at the tilted end."""
+        lines = self._lines(board, len(segments))
+        for i, (line, line_segments) in enumerate(zip(lines, segments)):
+            if not line:
+                continue
+            bits = format(line, "b")[::-1]  # bits[k] is bit k of the line
+            tilted = []
+            end = 0
+            for start, length in line_segments:
+                count = bits.count("1", start, start + length)
+                tilted.append("0" * (start - end))
+                tilted.append(
+                    "0" * (length - count) + "1" * count if towards_high_bits else "1" * count + "0" * (length - count)
+                )
+                end = start + length
+            lines[i] = int("".join(tilted)[::-1], 2)
+        return self._board(lines)
+
+    def tilt(self, rounded: int, direction: str) -> int:
+        """Returns rounded after tilting towards direction (N, W, S or E)."""
+        if direction in "NS":
+            # columns are the lines of the transposed board
+            return self.transpose(self._tilt_lines(self.transpose(rounded), self.column_segments, direction == "S"))
+        return self._tilt_lines(rounded, self.row_segments, direction == "E")
+
+    def spin_cycle(self, rounded: int) -> int:
+        for direction in "NWSE":
+            rounded = self.tilt(rounded, direction)
+        return rounded
+
+    def load_on_north_side(self, rounded: int) -> int:
+        return sum(
+            bin(line).count("1") * (self.height - row) for row, line in enumerate(self._lines(rounded, self.height))
+        )
 
 
 def part1(grid):
-    grid = tuple(tilt(row, direction="L") for row in transpose(grid))  # tilt North
-    print(load_on_north_side(transpose(grid)))  # noqa: T201
+    platform = Platform(grid)
+    print(platform.load_on_north_side(platform.tilt(platform.rounded, "N")))  # noqa: T201
 
 
 def part2(start_grid):
-    # detect cycle of spinc_cycle
-    tortoise = spin_cycle(start_grid)
-    hare = spin_cycle(tortoise)
-    while tortoise != hare:
-        tortoise = spin_cycle(tortoise)
-        hare = spin_cycle(spin_cycle(hare))
-
-    # find mu, the position of the first element of the cycle
-    mu = 0
-    tortoise = start_grid
-    while tortoise != hare:
-        tortoise = spin_cycle(tortoise)
-        hare = spin_cycle(hare)
-        mu += 1
-
-    # find lam, the length of the cycle
-    lam = 1
-    hare = spin_cycle(tortoise)
-    while tortoise != hare:
-        hare = spin_cycle(hare)
-        lam += 1
-
-    # find the grid after 10 ** 9 runs of spin_cycle
-    grid = start_grid
-    for _ in range((10**9 - (mu - 1)) % lam + mu - 1):
-        grid = spin_cycle(grid)
-    print(load_on_north_side(grid))  # noqa: T201
+    platform = Platform(start_grid)
+    cycle = find_cycle(platform.spin_cycle, platform.rounded, value=platform.load_on_north_side)
+    print(cycle.value_after(10**9))  # noqa: T201
 
 
 if __name__ == "__main__":
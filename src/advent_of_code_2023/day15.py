@@ -1,7 +1,19 @@
+import mmap
+from array import array
 from collections import OrderedDict
+from collections.abc import Iterable, Iterator
 
 from utils import read_lines
 
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, only used for the vectorized HASH
+    np = None
+
+# HASH_TABLE[cur * 256 + byte] is the HASH value after feeding byte to the current value cur
+HASH_TABLE = bytes((cur + byte) * 17 % 256 for cur in range(256) for byte in range(256))
+COMMA = ord(",")
+
 
 def hash_algo(string: str) -> int:
     cur = 0
@@ -10,24 +22,202 @@ def hash_algo(string: str) -> int:
     return cur
 
 
+def sequence_length(buffer) -> int:
+    """Length of the initialization sequence in buffer, without the trailing newline."""
+    end = len(buffer)
+    while end and buffer[end - 1] in b"\r\n":
+        end -= 1
+    return end
+
+
+def step_hashes(buffer, end: int) -> array:
+    """HASH of every comma separated step of buffer[:end], in one sweep through the transition table."""
+    hashes = array("B")
+    cur = 0
+    with memoryview(buffer) as view, view[:end] as sequence:
+        for byte in sequence:
+            if byte == COMMA:
+                hashes.append(cur)
+                cur = 0
+            else:
+                cur = HASH_TABLE[cur << 8 | byte]
+    hashes.append(cur)
+    return hashes
+
+
+def comma_aligned_windows(buffer, end: int, window_bytes: int) -> Iterator[tuple[int, int]]:
+    """Split buffer[:end] into (start, stop) windows of about window_bytes, each ending just after a comma."""
+    start = 0
+    while start < end:
+        stop = min(start + window_bytes, end)
+        if stop < end:
+            comma = buffer.rfind(b",", start, stop)
+            if comma == -1:
+                # a step longer than the window, extend the window to its end
+                comma = buffer.find(b",", stop, end)
+            stop = end if comma == -1 else comma + 1
+        yield start, stop
+        start = stop
+
+
+def step_hashes_numpy(buffer, end: int, window_bytes: int = 1 << 22) -> "np.ndarray":
+    """
+    Vectorized step_hashes.
+
+    Feeding c_0 ... c_n-1 gives sum(c_j * 17 ** (n - j)) mod 256, and 17 ** 16 == 1 mod 256, so each byte
+    is weighted by a power of 17 picked from its distance to the end of its step modulo 16, then each step
+    is summed.  The buffer is processed in comma aligned windows, with uint8 temporaries, so memory stays
+    bounded by window_bytes whatever the length of the sequence.
+    """
+    powers = np.array([pow(17, k, 256) for k in range(16)], dtype=np.uint8)
+    window_hashes = []
+    for start, stop in comma_aligned_windows(buffer, end, window_bytes):
+        size = stop - start
+        data = np.frombuffer(buffer, dtype=np.uint8, count=size, offset=start)
+        commas = np.flatnonzero(data == COMMA)
+        # every window but the last ends with a comma, the last also holds the final step
+        ends = commas if stop < end else np.append(commas, size)
+        starts = np.concatenate(([0], commas[: len(ends) - 1] + 1))
+        # (end of step - position) mod 16, uint8 wraps around at 256 which keeps it exact
+        end_of_step = np.repeat((ends & 15).astype(np.uint8), ends - starts + 1)[:size]
+        weight_index = (end_of_step - np.resize(np.arange(16, dtype=np.uint8), size)) & 15
+        weighted = data * powers[weight_index]
+        weighted[commas] = 0
+        # reduceat needs valid indices, empty steps are zeroed afterwards
+        sums = np.add.reduceat(weighted, np.minimum(starts, size - 1), dtype=np.uint8)
+        sums[starts == ends] = 0
+        window_hashes.append(sums)
+    return np.concatenate(window_hashes) if window_hashes else np.zeros(1, dtype=np.uint8)
+
+
 def part1(input_file: str):
-    lines = read_lines(input_file)
-    return sum(hash_algo(step) for step in lines[0].split(","))
+    with open(input_file, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        end = sequence_length(buffer)
+        if np is None:
+            return sum(step_hashes(buffer, end))
+        # the numpy view must not outlive the mapping
+        return int(step_hashes_numpy(buffer, end).sum(dtype=np.uint64))
+
+
+class FenwickTree:
+    """Prefix sums over positions 1..size with O(log size) point updates and queries."""
+
+    def __init__(self, size: int):
+        self.tree = [0] * (size + 1)
+
+    @classmethod
+    def from_values(cls, values: list[int]) -> "FenwickTree":
+        """Build in O(n), values[i] is at position i + 1."""
+        fenwick = cls(len(values))
+        tree = fenwick.tree
+        for index, value in enumerate(values, start=1):
+            tree[index] += value
+            parent = index + (index & -index)
+            if parent < len(tree):
+                tree[parent] += tree[index]
+        return fenwick
+
+    def __len__(self) -> int:
+        return len(self.tree) - 1
+
+    def add(self, index: int, delta: int) -> None:
+        while index < len(self.tree):
+            self.tree[index] += delta
+            index += index & -index
+
+    def prefix_sum(self, index: int) -> int:
+        total = 0
+        while index > 0:
+            total += self.tree[index]
+            index -= index & -index
+        return total
+
+
+class Box:
+    """
+    Lenses of a box, indexed by insertion sequence number.
+
+    One Fenwick tree counts the lenses and another sums their focal lengths by sequence number, so the
+    slot of a lens and the focal lengths behind it are O(log n) queries.
+    """
+
+    def __init__(self, capacity: int = 16):
+        self.lenses: dict[str, tuple[int, int]] = {}  # label -> (sequence number, focal length)
+        self.counts = FenwickTree(capacity)
+        self.focal_lengths = FenwickTree(capacity)
+        self.last_sequence = 0
+
+    def _compact(self) -> None:
+        """Renumber the lenses 1..n, in order, into trees with room to grow."""
+        ordered = sorted(self.lenses.items(), key=lambda item: item[1][0])
+        capacity = max(2 * len(ordered), 16)
+        self.lenses = {
+            label: (sequence, focal_length) for sequence, (label, (_, focal_length)) in enumerate(ordered, start=1)
+        }
+        focal_lengths = [focal_length for _, (_, focal_length) in ordered]
+        self.counts = FenwickTree.from_values([1] * len(ordered) + [0] * (capacity - len(ordered)))
+        self.focal_lengths = FenwickTree.from_values(focal_lengths + [0] * (capacity - len(ordered)))
+        self.last_sequence = len(ordered)
+
+    def put(self, label: str, focal_length: int) -> int:
+        """Insert or replace a lens, returns the change of sum(slot * focal length)."""
+        if label in self.lenses:
+            sequence, old_focal_length = self.lenses[label]
+            self.lenses[label] = (sequence, focal_length)
+            self.focal_lengths.add(sequence, focal_length - old_focal_length)
+            return self.counts.prefix_sum(sequence) * (focal_length - old_focal_length)
+        if self.last_sequence == len(self.counts):
+            self._compact()
+        self.last_sequence += 1
+        self.lenses[label] = (self.last_sequence, focal_length)
+        self.counts.add(self.last_sequence, 1)
+        self.focal_lengths.add(self.last_sequence, focal_length)
+        return len(self.lenses) * focal_length
+
+    def remove(self, label: str) -> int:
+        """Remove a lens if present, returns the change of sum(slot * focal length)."""
+        if label not in self.lenses:
+            return 0
+        sequence, focal_length = self.lenses.pop(label)
+        slot = self.counts.prefix_sum(sequence)
+        self.counts.add(sequence, -1)
+        self.focal_lengths.add(sequence, -focal_length)
+        # every lens behind the removed one moves forward by one slot
+        behind = self.focal_lengths.prefix_sum(len(self.focal_lengths)) - self.focal_lengths.prefix_sum(sequence)
+        return -slot * focal_length - behind
+
+
+class HashMap:
+    """HASHMAP procedure keeping the total focusing power up to date after every step."""
+
+    def __init__(self):
+        self.boxes = [Box() for _ in range(256)]
+        self.focusing_power = 0
+
+    def apply(self, step: str) -> int:
+        """Apply one step, returns the focusing power after it."""
+        if step.endswith("-"):
+            label = step[:-1]
+            box_number = hash_algo(label)
+            self.focusing_power += (box_number + 1) * self.boxes[box_number].remove(label)
+        else:
+            label, focal_length = step.split("=")
+            box_number = hash_algo(label)
+            self.focusing_power += (box_number + 1) * self.boxes[box_number].put(label, int(focal_length))
+        return self.focusing_power
+
+    def run(self, steps: Iterable[str]) -> Iterator[int]:
+        """Yield the focusing power after each step."""
+        for step in steps:
+            yield self.apply(step)
 
 
 def part2(input_file: str):
-    boxes = [OrderedDict() for _ in range(256)]
     lines = read_lines(input_file)
-    for step in lines[0].split(","):
-        if step.find("=") != -1:
-            label, focal_length = step.split("=")
-            boxes[hash_algo(label)][label] = int(focal_length)
-        if step.find("-") != -1:
-            label, _ = step.split("-")
-            box = boxes[hash_algo(label)]
-            if label in box:
-                del box[label]
-    return focusing_power(boxes)
+    hashmap = HashMap()
+    for _ in hashmap.run(lines[0].split(",")):
+        pass
+    return hashmap.focusing_power
 
 
 def focusing_power(boxes: list[OrderedDict[str, int]]) -> int:
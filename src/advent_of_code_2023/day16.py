@@ -1,9 +1,8 @@
-# grid to keep track of energized tiles
-# grid to for the contraption (from input)
-# a list to keep beams of light, with direction and next positions (x, y).
-from collections import deque
-from dataclasses import dataclass
+from array import array
+from concurrent.futures import ProcessPoolExecutor
 from enum import Enum
+from multiprocessing.shared_memory import SharedMemory
+from typing import Optional
 
 from utils import read_lines
 
@@ -15,127 +14,375 @@ class LightEntersFrom(Enum):
     BELOW = 4
 
 
-@dataclass
-class Tile:
-    label: str
-    light_entered_from: set[LightEntersFrom]
+# directions the light moves in, as bit positions of the visited mask
+EAST, WEST, SOUTH, NORTH = range(4)
+MOVING = {
+    LightEntersFrom.LEFT: EAST,
+    LightEntersFrom.RIGHT: WEST,
+    LightEntersFrom.ABOVE: SOUTH,
+    LightEntersFrom.BELOW: NORTH,
+}
+TILE_CODES = {".": 0, "/": 1, "\\": 2, "|": 3, "-": 4}
+# OUTGOING[tile code * 4 + direction] are the directions light leaves a tile in
+OUTGOING = (
+    # "."
+    ((EAST,), (WEST,), (SOUTH,), (NORTH,))
+    # "/"
+    + ((NORTH,), (SOUTH,), (WEST,), (EAST,))
+    # "\"
+    + ((SOUTH,), (NORTH,), (EAST,), (WEST,))
+    # "|"
+    + ((NORTH, SOUTH), (NORTH, SOUTH), (SOUTH,), (NORTH,))
+    # "-"
+    + ((EAST,), (WEST,), (WEST, EAST), (WEST, EAST))
+)
 
 
-def make_tiles(tile_labels: list[str]) -> list[list[Tile]]:
-    tiles = []
-    for row in tile_labels:
-        tiles.append([Tile(label, set()) for label in row])
-    return tiles
+class Contraption:
+    """
+    Contraption compiled to a flat grid of tile codes, cell = row * width + col.
 
+    next_tile[direction][cell] is the next cell that is not "." when moving from cell in direction,
+    or -1 if the light leaves the grid first, so runs of empty tiles are crossed in one step.
+    """
 
-class Contraption:
     def __init__(self, tile_labels: list[str]):
-        self.tiles = make_tiles(tile_labels)
-        self.num_tiles_energized = 0
+        self._set_shape(len(tile_labels), len(tile_labels[0]))
+        self.tiles = bytearray(TILE_CODES[label] for row in tile_labels for label in row)
+        self.next_tile = [array("i", [-1]) * len(self.tiles) for _ in range(4)]
+        for row in range(self.height):
+            self._link(EAST, range(row * self.width + self.width - 1, row * self.width - 1, -1))
+            self._link(WEST, range(row * self.width, row * self.width + self.width))
+        for col in range(self.width):
+            self._link(SOUTH, range(col + (self.height - 1) * self.width, -1, -self.width))
+            self._link(NORTH, range(col, len(self.tiles), self.width))
+
+    def _set_shape(self, height: int, width: int) -> None:
+        self.height, self.width = height, width
+        self.steps = (1, -1, width, -width)
+        self.ones = memoryview(bytes([1]) * max(height, width))
+
+    def shared_size(self) -> int:
+        """Bytes needed by copy_to: the four next_tile arrays followed by the tiles."""
+        return len(self.tiles) * (4 * self.next_tile[0].itemsize + 1)
+
+    def copy_to(self, buffer: memoryview) -> None:
+        offset = 0
+        for next_tile in self.next_tile:
+            data = next_tile.tobytes()
+            buffer[offset : offset + len(data)] = data
+            offset += len(data)
+        buffer[offset : offset + len(self.tiles)] = self.tiles
+
+    @classmethod
+    def from_buffer(cls, buffer: memoryview, height: int, width: int) -> "Contraption":
+        """Contraption reading its tiles and next_tile arrays from a buffer filled by copy_to, without copying."""
+        contraption = cls.__new__(cls)
+        contraption._set_shape(height, width)
+        num_cells = height * width
+        size = num_cells * array("i").itemsize
+        contraption.next_tile = [buffer[d * size : (d + 1) * size].cast("i") for d in range(4)]
+        contraption.tiles = buffer[4 * size : 4 * size + num_cells]
+        return contraption
+
+    def _link(self, direction: int, cells: range) -> None:
+        """Fill next_tile[direction] for cells, listed from the far end of the light's path back."""
+        next_tile = self.next_tile[direction]
+        nearest = -1
+        for cell in cells:
+            next_tile[cell] = nearest
+            if self.tiles[cell]:
+                nearest = cell
+
+    def edge(self, cell: int, direction: int) -> int:
+        """Last cell before the light leaves the grid moving from cell in direction."""
+        col = cell % self.width
+        if direction == EAST:
+            return cell - col + self.width - 1
+        if direction == WEST:
+            return cell - col
+        if direction == SOUTH:
+            return col + (self.height - 1) * self.width
+        return col
+
+    def run_cells(self, cell: int, direction: int) -> range:
+        """Cells the light crosses after leaving cell in direction, up to the next tile or the edge."""
+        step = self.steps[direction]
+        next_cell = self.next_tile[direction][cell]
+        stop = next_cell if next_cell != -1 else self.edge(cell, direction) + step
+        return range(cell + step, stop, step)
+
+    def energize(self, cell: int, direction: int) -> bytearray:
+        """Returns energized[cell] = 1 for every tile energized by light entering cell moving in direction."""
+        energized = bytearray(len(self.tiles))
+        visited = bytearray(len(self.tiles))  # bit d of visited[cell] is set once light entered cell moving in d
+        beams = [(cell, direction)]
+        while beams:
+            cell, direction = beams.pop()
+            if visited[cell] >> direction & 1:
+                # cycle detected
+                continue
+            visited[cell] |= 1 << direction
+            energized[cell] = 1
+            for outgoing in OUTGOING[self.tiles[cell] * 4 + direction]:
+                run = self.run_cells(cell, outgoing)
+                if run:
+                    first, last = sorted((run[0], run[-1]))
+                    energized[first : last + 1 : abs(run.step)] = self.ones[: len(run)]
+                next_cell = self.next_tile[outgoing][cell]
+                if next_cell != -1:
+                    beams.append((next_cell, outgoing))
+        return energized
+
+    def num_tiles_energized(self, starting_step: tuple[int, int, LightEntersFrom]) -> int:
+        row, col, light_enters_from = starting_step
+        return sum(self.energize(row * self.width + col, MOVING[light_enters_from]))
+
+    def state(self, starting_step: tuple[int, int, LightEntersFrom]) -> int:
+        """Beam state cell * 4 + direction of light entering a tile."""
+        row, col, light_enters_from = starting_step
+        return (row * self.width + col) * 4 + MOVING[light_enters_from]
+
+    def successors(self, state: int) -> list[int]:
+        """States reached at the next non-empty tiles."""
+        cell, direction = divmod(state, 4)
+        return [
+            self.next_tile[outgoing][cell] * 4 + outgoing
+            for outgoing in OUTGOING[self.tiles[cell] * 4 + direction]
+            if self.next_tile[outgoing][cell] != -1
+        ]
+
+    def own_cells(self, state: int) -> int:
+        """Bitset of the tile of state and the empty tiles crossed until the next tiles."""
+        cell, direction = divmod(state, 4)
+        bits = 1 << cell
+        for outgoing in OUTGOING[self.tiles[cell] * 4 + direction]:
+            run = self.run_cells(cell, outgoing)
+            if run:
+                first = min(run[0], run[-1])
+                stride = abs(run.step)
+                # bits first, first + stride, ... as a geometric series
+                bits |= ((1 << (len(run) * stride)) - 1) // ((1 << stride) - 1) << first
+        return bits
+
+    def strongly_connected_components(self, roots: list[int]) -> tuple[array, list[list[int]]]:
+        """
+        Strongly connected components of the beam states reachable from roots (Tarjan's algorithm).
+
+        Returns component[state] (-1 if unreachable) and the members of every component, listed in the
+        order they complete: a component only leads to components listed before it.
+        """
+        num_states = 4 * len(self.tiles)
+        index = array("i", [-1]) * num_states
+        low = array("i", [0]) * num_states
+        component = array("i", [-1]) * num_states
+        on_stack = bytearray(num_states)
+        stack: list[int] = []
+        components: list[list[int]] = []
+        counter = 0
+        for root in roots:
+            if index[root] != -1:
+                continue
+            index[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = 1
+            work = [(root, iter(self.successors(root)))]
+            while work:
+                state, successors = work[-1]
+                for successor in successors:
+                    if index[successor] == -1:
+                        index[successor] = low[successor] = counter
+                        counter += 1
+                        stack.append(successor)
+                        on_stack[successor] = 1
+                        work.append((successor, iter(self.successors(successor))))
+                        break
+                    if on_stack[successor]:
+                        low[state] = min(low[state], index[successor])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        low[parent] = min(low[parent], low[state])
+                    if low[state] == index[state]:
+                        components.append(self._pop_component(state, stack, on_stack, component, len(components)))
+        return component, components
+
+    @staticmethod
+    def _pop_component(
+        root: int, stack: list[int], on_stack: bytearray, component: array, component_id: int
+    ) -> list[int]:
+        """Pop the component of root off the stack, returns its members."""
+        members = []
+        while True:
+            member = stack.pop()
+            on_stack[member] = 0
+            component[member] = component_id
+            members.append(member)
+            if member == root:
+                return members
+
+    def energized_counts(self, starting_steps: list[tuple[int, int, LightEntersFrom]]) -> list[int]:
+        """
+        Number of tiles energized by each starting step, sharing the work between them.
 
-    def pass_through(
-        self, row: int, col: int, light_enters_from: LightEntersFrom
-    ) -> tuple[tuple[int, int, LightEntersFrom]]:
+        Beam states form a graph between non-empty tiles; its strongly connected components are visited
+        sinks first, so the energized bitset of a component is its own cells plus the already computed
+        bitsets of the components it leads to.  A bitset is dropped as soon as every component leading
+        to it has used it, so only the bitsets on the frontier of the condensation are kept.
         """
-        Given a tile coordinate and a light enters from direction,
-        return a list of resulting tile coorindates and light enters froms.
+        roots = [self.state(starting_step) for starting_step in starting_steps]
+        component, components = self.strongly_connected_components(roots)
+        # edges into each component from other components, each one uses its bitset once
+        pending_uses = array("i", [0]) * len(components)
+        for component_id, members in enumerate(components):
+            for member in members:
+                for successor in self.successors(member):
+                    if component[successor] != component_id:
+                        pending_uses[component[successor]] += 1
+        root_components = {component[root] for root in roots}
+        counts: dict[int, int] = {}
+        component_cells: dict[int, int] = {}
+        for component_id, members in enumerate(components):
+            cells = 0
+            for member in members:
+                cells |= self.own_cells(member)
+                for successor in self.successors(member):
+                    successor_id = component[successor]
+                    if successor_id != component_id:
+                        cells |= component_cells[successor_id]
+                        pending_uses[successor_id] -= 1
+                        if not pending_uses[successor_id]:
+                            del component_cells[successor_id]
+            if component_id in root_components:
+                counts[component_id] = bin(cells).count("1")
+            if pending_uses[component_id]:
+                component_cells[component_id] = cells
+        return [counts[component[root]] for root in roots]
 
-        Args:
-            row (int): row index of tile
-            col (int): col index of tile
-            light_enters_from (LightEntersFrom): direction from which light enters the tile.
+    def cell_entry_masks(self, starting_steps: list[tuple[int, int, LightEntersFrom]]) -> list[int]:
         """
-        # check grid boundary
-        if row in (-1, len(self.tiles)) or col in (-1, len(self.tiles[0])):
-            return ()
-        tile = self.tiles[row][col]
-        if light_enters_from in tile.light_entered_from:
-            # cycle detected, return empty list
-            return ()
-        if len(tile.light_entered_from) == 0:
-            # first time light enters this tile
-            self.num_tiles_energized += 1
-        tile.light_entered_from.add(light_enters_from)
-
-        if tile.label == ".":
-            if light_enters_from == LightEntersFrom.LEFT:
-                return ([row, col + 1, LightEntersFrom.LEFT],)
-            if light_enters_from == LightEntersFrom.RIGHT:
-                return ([row, col - 1, LightEntersFrom.RIGHT],)
-            if light_enters_from == LightEntersFrom.ABOVE:
-                return ([row + 1, col, LightEntersFrom.ABOVE],)
-            if light_enters_from == LightEntersFrom.BELOW:
-                return ([row - 1, col, LightEntersFrom.BELOW],)
-        if tile.label == "/":
-            if light_enters_from == LightEntersFrom.LEFT:
-                return ([row - 1, col, LightEntersFrom.BELOW],)
-            if light_enters_from == LightEntersFrom.RIGHT:
-                return ([row + 1, col, LightEntersFrom.ABOVE],)
-            if light_enters_from == LightEntersFrom.ABOVE:
-                return ([row, col - 1, LightEntersFrom.RIGHT],)
-            if light_enters_from == LightEntersFrom.BELOW:
-                return ([row, col + 1, LightEntersFrom.LEFT],)
-        if tile.label == "\\":
-            if light_enters_from == LightEntersFrom.LEFT:
-                return ([row + 1, col, LightEntersFrom.ABOVE],)
-            if light_enters_from == LightEntersFrom.RIGHT:
-                return ([row - 1, col, LightEntersFrom.BELOW],)
-            if light_enters_from == LightEntersFrom.ABOVE:
-                return ([row, col + 1, LightEntersFrom.LEFT],)
-            if light_enters_from == LightEntersFrom.BELOW:
-                return ([row, col - 1, LightEntersFrom.RIGHT],)
-        if tile.label == "|":
-            if light_enters_from == LightEntersFrom.LEFT:
-                return [row - 1, col, LightEntersFrom.BELOW], [row + 1, col, LightEntersFrom.ABOVE]
-            if light_enters_from == LightEntersFrom.RIGHT:
-                return [row - 1, col, LightEntersFrom.BELOW], [row + 1, col, LightEntersFrom.ABOVE]
-            if light_enters_from == LightEntersFrom.ABOVE:
-                return ([row + 1, col, LightEntersFrom.ABOVE],)
-            if light_enters_from == LightEntersFrom.BELOW:
-                return ([row - 1, col, LightEntersFrom.BELOW],)
-        if tile.label == "-":
-            if light_enters_from == LightEntersFrom.LEFT:
-                return ([row, col + 1, LightEntersFrom.LEFT],)
-            if light_enters_from == LightEntersFrom.RIGHT:
-                return ([row, col - 1, LightEntersFrom.RIGHT],)
-            if light_enters_from == LightEntersFrom.ABOVE:
-                return [row, col - 1, LightEntersFrom.RIGHT], [row, col + 1, LightEntersFrom.LEFT]
-            if light_enters_from == LightEntersFrom.BELOW:
-                return [row, col - 1, LightEntersFrom.RIGHT], [row, col + 1, LightEntersFrom.LEFT]
+        Propagate every starting step at once, returns masks[cell] with bit i set if starting_steps[i] energizes cell.
+
+        All states of a strongly connected component are reached by the same starting steps, so a bitmask
+        of starting steps is propagated once per component, in topological order of the condensation.
+        """
+        roots = [self.state(starting_step) for starting_step in starting_steps]
+        component, components = self.strongly_connected_components(roots)
+        component_masks = [0] * len(components)
+        for entry, root in enumerate(roots):
+            component_masks[component[root]] |= 1 << entry
+        cell_masks = [0] * len(self.tiles)
+        # components complete sinks first, so in reverse every component comes after all components leading to it
+        for component_id in range(len(components) - 1, -1, -1):
+            mask = component_masks[component_id]
+            component_masks[component_id] = 0
+            for member in components[component_id]:
+                cell, direction = divmod(member, 4)
+                cell_masks[cell] |= mask
+                for outgoing in OUTGOING[self.tiles[cell] * 4 + direction]:
+                    for crossed in self.run_cells(cell, outgoing):
+                        cell_masks[crossed] |= mask
+                    next_cell = self.next_tile[outgoing][cell]
+                    if next_cell != -1 and component[next_cell * 4 + outgoing] != component_id:
+                        component_masks[component[next_cell * 4 + outgoing]] |= mask
+        return cell_masks
+
+    def bit_parallel_energized_counts(self, starting_steps: list[tuple[int, int, LightEntersFrom]]) -> list[int]:
+        """Number of tiles energized by each starting step, from a single propagation of all of them."""
+        return count_bits_by_position(self.cell_entry_masks(starting_steps), len(starting_steps))
+
+
+def count_bits_by_position(masks: list[int], num_positions: int) -> list[int]:
+    """
+    counts[i] = number of masks with bit i set.
+
+    The counters are bit sliced: planes[k] holds bit k of every counter, so adding a mask is a ripple
+    carry over the planes with whole int operations.
+    """
+    planes: list[int] = []
+    for mask in masks:
+        carry = mask
+        for k, plane in enumerate(planes):
+            if not carry:
+                break
+            planes[k], carry = plane ^ carry, plane & carry
+        if carry:
+            planes.append(carry)
+    return [sum((plane >> i & 1) << k for k, plane in enumerate(planes)) for i in range(num_positions)]
 
 
 def part1(input_file: str):
-    tile_labels = read_lines(input_file)
-    contraption = Contraption(tile_labels)
-    next_steps = deque()
-    next_steps.append((0, 0, LightEntersFrom.LEFT))
-    while next_steps:
-        steps = contraption.pass_through(*(next_steps.popleft()))
-        next_steps.extend(steps)
-    return contraption.num_tiles_energized
+    contraption = Contraption(read_lines(input_file))
+    return contraption.num_tiles_energized((0, 0, LightEntersFrom.LEFT))
 
 
 def num_tiles_energized(tile_labels: list[str], starting_step: tuple[int, int, LightEntersFrom]) -> int:
-    contraption = Contraption(tile_labels)
-    next_steps = deque()
-    next_steps.append(starting_step)
-    while next_steps:
-        steps = contraption.pass_through(*(next_steps.popleft()))
-        next_steps.extend(steps)
-    return contraption.num_tiles_energized
+    return Contraption(tile_labels).num_tiles_energized(starting_step)
 
 
-def part2(input_file: str):
-    tile_labels = read_lines(input_file)
-    num_rows = len(tile_labels)
-    num_cols = len(tile_labels[0])
-    starting_steps = (
+def starting_steps(num_rows: int, num_cols: int) -> list[tuple[int, int, LightEntersFrom]]:
+    return (
         [(i, 0, LightEntersFrom.LEFT) for i in range(num_rows)]
         + [(i, num_cols - 1, LightEntersFrom.RIGHT) for i in range(num_rows)]
         + [(0, i, LightEntersFrom.ABOVE) for i in range(num_cols)]
         + [(num_rows - 1, i, LightEntersFrom.BELOW) for i in range(num_cols)]
     )
-    return max(num_tiles_energized(tile_labels, starting_step) for starting_step in starting_steps)
+
+
+def part2(input_file: str):
+    contraption = Contraption(read_lines(input_file))
+    return max(contraption.energized_counts(starting_steps(contraption.height, contraption.width)))
+
+
+# set in each worker process by _attach_contraption
+worker_contraption: Optional[Contraption] = None
+worker_memory: Optional[SharedMemory] = None
+
+
+def _attach_contraption(name: str, height: int, width: int) -> None:
+    global worker_contraption, worker_memory  # noqa: PLW0603
+    worker_memory = SharedMemory(name=name)
+    worker_contraption = Contraption.from_buffer(worker_memory.buf, height, width)
+
+
+def _energize_batch(batch: list[tuple[int, int, LightEntersFrom]]) -> list[int]:
+    return [worker_contraption.num_tiles_energized(starting_step) for starting_step in batch]
+
+
+def parallel_energized_counts(
+    contraption: Contraption,
+    starting_steps: list[tuple[int, int, LightEntersFrom]],
+    workers: Optional[int] = None,
+    batch_size: int = 64,
+) -> dict[tuple[int, int, LightEntersFrom], int]:
+    """
+    Number of tiles energized by each starting step, simulated in a process pool.
+
+    The compiled grid is placed in shared memory once, every worker maps it on start up and then
+    receives batches of starting steps.
+    """
+    memory = SharedMemory(create=True, size=contraption.shared_size())
+    try:
+        contraption.copy_to(memory.buf)
+        batches = [starting_steps[i : i + batch_size] for i in range(0, len(starting_steps), batch_size)]
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_attach_contraption,
+            initargs=(memory.name, contraption.height, contraption.width),
+        ) as executor:
+            counts = [count for batch_counts in executor.map(_energize_batch, batches) for count in batch_counts]
+    finally:
+        memory.close()
+        memory.unlink()
+    return dict(zip(starting_steps, counts))
+
+
+def parallel_part2(input_file: str, workers: Optional[int] = None, batch_size: int = 64) -> int:
+    contraption = Contraption(read_lines(input_file))
+    steps = starting_steps(contraption.height, contraption.width)
+    return max(parallel_energized_counts(contraption, steps, workers, batch_size).values())
 
 
 if __name__ == "__main__":
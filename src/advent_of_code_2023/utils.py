@@ -1,5 +1,180 @@
+import mmap
+import operator
+import os
+from collections.abc import Callable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import partial, reduce
+from typing import Any, Optional
+
+
 def read_lines(file_name: str, delimiter: str = None) -> list[str]:
     with open(file_name) as file:
         if delimiter:
             return file.read().split(delimiter)
         return file.read().splitlines()
+
+
+def newline_aligned_chunks(buffer: mmap.mmap, chunk_bytes: int) -> list[tuple[int, int]]:
+    """Split buffer into (start, stop) offsets of roughly chunk_bytes each, every chunk ending on a line boundary."""
+    chunks = []
+    start = 0
+    while start < len(buffer):
+        newline = buffer.find(b"\n", min(start + chunk_bytes, len(buffer)) - 1)
+        stop = len(buffer) if newline == -1 else newline + 1
+        chunks.append((start, stop))
+        start = stop
+    return chunks
+
+
+def iter_lines(buffer: mmap.mmap, start: int, stop: int) -> Iterator[bytes]:
+    """Yield lines (without the trailing newline) of buffer[start:stop]."""
+    while start < stop:
+        end = buffer.find(b"\n", start, stop)
+        if end == -1:
+            end = stop
+        yield buffer[start:end]
+        start = end + 1
+
+
+def _map_chunk(file_name: str, chunk_func: Callable[[Iterator[Any]], Any], binary: bool, chunk: tuple[int, int]) -> Any:
+    # each worker maps the file on its own, so chunks are never copied between processes
+    with open(file_name, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        lines = iter_lines(buffer, *chunk)
+        if not binary:
+            lines = (line.decode() for line in lines)
+        return chunk_func(lines)
+
+
+def map_line_chunks(
+    file_name: str,
+    chunk_func: Callable[[Iterator[Any]], Any],
+    *,
+    workers: Optional[int] = None,
+    chunk_bytes: int = 1 << 24,
+    binary: bool = False,
+) -> list[Any]:
+    """
+    Memory map file_name and apply chunk_func to the lines of every newline-aligned chunk in a process pool.
+
+    Returns the per-chunk results in file order.  chunk_func must be picklable (i.e. a module level function).
+
+    Args:
+        file_name (str): input file
+        chunk_func (Callable): function applied to an iterator over the lines (str, or bytes if binary) of a chunk
+        workers (int): number of worker processes, defaults to os.cpu_count(), 1 runs in this process
+        chunk_bytes (int): approximate size of each chunk, bounds the memory touched per task
+        binary (bool): pass lines as bytes instead of decoding to str
+    """
+    if os.path.getsize(file_name) == 0:
+        return []
+    with open(file_name, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        chunks = newline_aligned_chunks(buffer, chunk_bytes)
+    map_chunk = partial(_map_chunk, file_name, chunk_func, binary)
+    if workers == 1 or len(chunks) == 1:
+        return list(map(map_chunk, chunks))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(map_chunk, chunks))
+
+
+def _reduce_lines(
+    line_func: Callable[[Any], Any], reduce_func: Callable[[Any, Any], Any], initial: Any, lines: Iterator[Any]
+) -> Any:
+    return reduce(reduce_func, map(line_func, lines), initial)
+
+
+def map_reduce_lines(
+    file_name: str,
+    line_func: Callable[[Any], Any],
+    reduce_func: Callable[[Any, Any], Any] = operator.add,
+    initial: Any = 0,
+    *,
+    workers: Optional[int] = None,
+    chunk_bytes: int = 1 << 24,
+    binary: bool = False,
+) -> Any:
+    """
+    Memory map file_name, apply line_func to every line and fold the results with reduce_func.
+
+    The file is split into newline-aligned chunks which are reduced in a process pool, then the
+    per-chunk results are reduced once more, so initial must be an identity of reduce_func.
+    line_func and reduce_func must be picklable (i.e. module level functions).
+
+    Args:
+        file_name (str): input file
+        line_func (Callable): function applied to each line (str, or bytes if binary), without trailing newline
+        reduce_func (Callable): associative function combining two results
+        initial (Any): identity of reduce_func
+        workers (int): number of worker processes, defaults to os.cpu_count(), 1 runs in this process
+        chunk_bytes (int): approximate size of each chunk, bounds the memory touched per task
+        binary (bool): pass lines as bytes instead of decoding to str
+    """
+    reduce_lines = partial(_reduce_lines, line_func, reduce_func, initial)
+    chunk_results = map_line_chunks(file_name, reduce_lines, workers=workers, chunk_bytes=chunk_bytes, binary=binary)
+    return reduce(reduce_func, chunk_results, initial)
+
+
+def brent(f: Callable[[Any], Any], x0: Any) -> tuple[int, int]:
+    """
+    Brent's cycle detection on x0, f(x0), f(f(x0)), ... in constant memory.
+
+    Returns (mu, lam): index of the first state of the cycle, and the cycle length.
+    """
+    # find lam, searching in windows of doubling size
+    power = lam = 1
+    tortoise, hare = x0, f(x0)
+    while tortoise != hare:
+        if power == lam:
+            tortoise = hare
+            power *= 2
+            lam = 0
+        hare = f(hare)
+        lam += 1
+    # find mu, with the hare lam states ahead of the tortoise
+    tortoise = hare = x0
+    for _ in range(lam):
+        hare = f(hare)
+    mu = 0
+    while tortoise != hare:
+        tortoise, hare = f(tortoise), f(hare)
+        mu += 1
+    return mu, lam
+
+
+@dataclass
+class Cycle:
+    """Cycle of x0, f(x0), ... with a scalar value recorded for every state up to the end of the first cycle."""
+
+    mu: int
+    lam: int
+    values: list[Any]
+
+    def value_after(self, iterations: int) -> Any:
+        """Value of the state reached after iterations applications of f."""
+        if iterations >= self.mu:
+            iterations = self.mu + (iterations - self.mu) % self.lam
+        return self.values[iterations]
+
+
+def find_cycle(
+    f: Callable[[Any], Any],
+    x0: Any,
+    value: Callable[[Any], Any] = lambda state: state,
+    fingerprint: Callable[[Any], Any] = lambda state: state,
+) -> Cycle:
+    """
+    Detect the cycle of x0, f(x0), ... in a single pass through the prefix and the cycle.
+
+    Only fingerprint(state) -> index and value(state) are kept per state.  States are compared exactly by
+    default; a fingerprint saving memory on large states must be a wide digest (e.g. 128 bit blake2b), as
+    any collision is taken for a cycle.
+    """
+    first_seen: dict[Any, int] = {}
+    values: list[Any] = []
+    state = x0
+    while (key := fingerprint(state)) not in first_seen:
+        first_seen[key] = len(values)
+        values.append(value(state))
+        state = f(state)
+    mu = first_seen[key]
+    return Cycle(mu, len(values) - mu, values)
@@ -0,0 +1,8 @@
+# SPDX-FileCopyrightText: 2023-present Eric Ti Yu Chiang <eric.ti.yu.chiang@gmail.com>
+#
+# SPDX-License-Identifier: MIT
+import sys
+from pathlib import Path
+
+# the day modules are scripts importing their siblings (from utils import ...)
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "advent_of_code_2023"))
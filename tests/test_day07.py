@@ -0,0 +1,45 @@
+# SPDX-FileCopyrightText: 2023-present Eric Ti Yu Chiang <eric.ti.yu.chiang@gmail.com>
+#
+# SPDX-License-Identifier: MIT
+import random
+
+import day07
+import pytest
+from day07 import external_total_winnings, parse_hands, total_winnings
+
+
+@pytest.fixture(autouse=True, scope="module")
+def hand_type_table_in_tmp_path(tmp_path_factory):
+    """Keep the saved hand type table out of the real cache directory, built once for the module."""
+    saved_path = day07.HAND_TYPE_TABLE_PATH
+    day07.HAND_TYPE_TABLE_PATH = tmp_path_factory.mktemp("cache") / "day07_hand_types.bin"
+    day07.load_hand_type_table.cache_clear()
+    yield
+    day07.HAND_TYPE_TABLE_PATH = saved_path
+    day07.load_hand_type_table.cache_clear()
+
+
+def test_equal_hands_are_ranked_in_input_order():
+    lines = ["AAAAA 5", "AAAAA 1", "23456 7"]
+    keys, _, bids = parse_hands(lines)
+    assert total_winnings(keys, bids) == 20
+    assert external_total_winnings(lines, joker_active=False) == 20
+
+
+def test_external_sort_with_multiple_merge_passes():
+    rng = random.Random(7)
+    lines = [f"{''.join(rng.choice('AKQJT98') for _ in range(5))} {rng.randint(1, 1000)}" for _ in range(3000)]
+    keys, joker_keys, bids = parse_hands(lines)
+    # 100 entries per run and 3 runs per merge: 30 runs go through 4 merge passes
+    assert external_total_winnings(lines, joker_active=False, memory_budget=4800, max_fan_in=3) == total_winnings(
+        keys, bids
+    )
+    assert external_total_winnings(lines, joker_active=True, memory_budget=4800, max_fan_in=3) == total_winnings(
+        joker_keys, bids
+    )
+
+
+def test_unwritable_cache_falls_back_to_memory():
+    assert bytes(day07.load_hand_type_table(day07.Path("/proc/advent_of_code_2023/day07_hand_types.bin"))) == (
+        bytes(day07.load_hand_type_table())
+    )
@@ -0,0 +1,51 @@
+# SPDX-FileCopyrightText: 2023-present Eric Ti Yu Chiang <eric.ti.yu.chiang@gmail.com>
+#
+# SPDX-License-Identifier: MIT
+import random
+from math import lcm
+
+from day08 import JumpTable, crt, simultaneous_traverse
+
+# with at most 6 nodes and 3 instructions, tails are at most 18 steps and cycle lengths are 3 * (1..6) steps,
+# so the ghosts repeat together within 18 + lcm(3 * 1, ..., 3 * 6) steps, well below this bound
+BRUTE_FORCE_STEPS = 1000
+
+
+def brute_force_common_step(instructions: str, label_triples: list[tuple[str, str, str]]) -> int:
+    network = {label: (left, right) for label, left, right in label_triples}
+    ghosts = [label for label, _, _ in label_triples if label.endswith("A")]
+    for steps in range(1, BRUTE_FORCE_STEPS):
+        direction = instructions[(steps - 1) % len(instructions)]
+        ghosts = [network[ghost][direction == "R"] for ghost in ghosts]
+        if all(ghost.endswith("Z") for ghost in ghosts):
+            return steps
+    return None
+
+
+def test_crt_matches_brute_force():
+    for modulus1 in range(1, 10):
+        for modulus2 in range(1, 10):
+            for residue1 in range(modulus1):
+                for residue2 in range(modulus2):
+                    solutions = [
+                        x for x in range(modulus1 * modulus2) if x % modulus1 == residue1 and x % modulus2 == residue2
+                    ]
+                    solution = crt(residue1, modulus1, residue2, modulus2)
+                    if solutions:
+                        assert solution == (solutions[0], lcm(modulus1, modulus2))
+                    else:
+                        assert solution is None
+
+
+def test_simultaneous_traverse_matches_brute_force():
+    # several end nodes per cycle and tails of different lengths come up in random networks
+    rng = random.Random(8)
+    for _ in range(1000):
+        num_nodes = rng.randint(1, 6)
+        labels = [f"{i}{rng.choice('AZX')}" for i in range(num_nodes)]
+        if not any(label.endswith("A") for label in labels):
+            labels[0] = "0A"
+        label_triples = [(label, rng.choice(labels), rng.choice(labels)) for label in labels]
+        instructions = "".join(rng.choice("LR") for _ in range(rng.randint(1, 3)))
+        table = JumpTable(instructions, label_triples, [label for label in labels if label.endswith("Z")])
+        assert simultaneous_traverse(table, workers=1) == brute_force_common_step(instructions, label_triples)
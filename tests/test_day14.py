@@ -0,0 +1,45 @@
+# SPDX-FileCopyrightText: 2023-present Eric Ti Yu Chiang <eric.ti.yu.chiang@gmail.com>
+#
+# SPDX-License-Identifier: MIT
+import random
+
+from day14 import Platform
+from utils import find_cycle
+
+
+def exact_cycle(platform: Platform) -> tuple[int, int, list[int]]:
+    """mu, lam and loads of the spin cycles, detected on the full grid of rocks."""
+    first_seen: dict[tuple[str, ...], int] = {}
+    loads = []
+    rounded = platform.rounded
+    while (grid := grid_of(platform, rounded)) not in first_seen:
+        first_seen[grid] = len(loads)
+        loads.append(sum(row.count("O") * (platform.height - r) for r, row in enumerate(grid)))
+        rounded = platform.spin_cycle(rounded)
+    mu = first_seen[grid]
+    return mu, len(loads) - mu, loads
+
+
+def grid_of(platform: Platform, rounded: int) -> tuple[str, ...]:
+    return tuple(
+        "".join(
+            (
+                "O"
+                if rounded >> (row * platform.size + col) & 1
+                else "#" if platform.cubes >> (row * platform.size + col) & 1 else "."
+            )
+            for col in range(platform.width)
+        )
+        for row in range(platform.height)
+    )
+
+
+def test_find_cycle_matches_exact_state_detection():
+    rng = random.Random(2023)
+    for _ in range(2000):
+        height, width = rng.randint(1, 24), rng.randint(1, 12)
+        grid = tuple("".join(rng.choice("OO.#..") for _ in range(width)) for _ in range(height))
+        platform = Platform(grid)
+        cycle = find_cycle(platform.spin_cycle, platform.rounded, value=platform.load_on_north_side)
+        mu, lam, loads = exact_cycle(platform)
+        assert (cycle.mu, cycle.lam, cycle.values) == (mu, lam, loads)